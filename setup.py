@@ -21,6 +21,11 @@ setup(
     url="https://github.com/bzdvdn/yandex-webmaster-api",
     license="MIT",
     python_requires=">=3.8",
+    entry_points={
+        "console_scripts": [
+            "yandex-webmaster-sync=yandex_webmaster.daemon:main",
+        ],
+    },
     long_description=read("README.md"),
     long_description_content_type="text/markdown",
 )
@@ -0,0 +1,94 @@
+import ssl
+import json
+import time
+import shutil
+import threading
+import subprocess
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from yandex_webmaster import YandexWebmaster
+from yandex_webmaster.profiling import Profiler
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.endswith("/hosts"):
+            body = {"hosts": [{"host_id": "https:example.com:443"}]}
+        else:
+            body = {"user_id": 1}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def https_server(tmp_path):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", str(key), "-out", str(cert), "-days", "1",
+            "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )  # fmt: skip
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(str(cert), str(key))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"https://localhost:{server.server_port}/", str(cert)
+    server.shutdown()
+    server.server_close()
+
+
+def test_profiled_https_request(https_server, monkeypatch):
+    url, cert = https_server
+    monkeypatch.setenv("REQUESTS_CA_BUNDLE", cert)
+    monkeypatch.setattr(YandexWebmaster, "API_URL", url)
+    with YandexWebmaster("token") as client:
+        profiler = client.enable_profiling()
+        assert client.get_hosts() == [{"host_id": "https:example.com:443"}]
+    [record] = profiler.records
+    assert record.name == "hosts"
+    assert record.status_code == 200
+    for phase in ("connect", "tls", "server_wait", "download", "decode"):
+        assert phase in record.phases
+    assert profiler.summary()["hosts"]["calls"] == 1
+
+
+def test_disable_profiling_stops_tracemalloc(monkeypatch):
+    monkeypatch.setattr(YandexWebmaster, "_resolve_user_id", lambda self: 1)
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc is started outside of profiler")
+    client = YandexWebmaster("token")
+    profiler = client.enable_profiling()
+    assert tracemalloc.is_tracing()
+    assert client.disable_profiling() is profiler
+    assert client.profiler is None
+    assert not tracemalloc.is_tracing()
+
+
+def test_stream_download_excludes_caller_time():
+    profiler = Profiler(trace_allocations=False)
+    with profiler.call("get", "user/1/hosts/h/links/external/samples") as record:
+        for _ in profiler.download([b"a", b"b"]):
+            time.sleep(0.05)
+    assert record.phases["download"][1] < 0.05
+    assert record.duration >= 0.1
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from yandex_webmaster import YandexWebmaster
+from yandex_webmaster.errors import YandexWebmasterServerError
+from yandex_webmaster.streaming import iter_json_array_items
+
+ITEMS = [
+    {"url": "https://example.com/a", "title": 'тест \\"q\\"'},
+    1.5e3,
+    -0.25,
+    7,
+    "text, with ] and }",
+    True,
+    None,
+    [1, [2.5e-3]],
+]
+BODY = json.dumps(
+    {"count": 8, "skipped": [{"a": 1e10}, -2.0e3], "links": ITEMS, "after": 1},
+    ensure_ascii=False,
+).encode("utf-8")
+
+
+def split(body: bytes, size: int) -> list:
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("size", range(1, len(BODY) + 1))
+def test_chunk_boundaries(size):
+    assert list(iter_json_array_items(split(BODY, size), "links")) == ITEMS
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_numbers_split_by_chunks(size):
+    body = b'{"links": [1.5e3, 2.25, -10, 3E-2]}'
+    items = list(iter_json_array_items(split(body, size), "links"))
+    assert items == [1.5e3, 2.25, -10, 3e-2]
+
+
+def test_missing_key():
+    assert list(iter_json_array_items([b'{"count": 0}'], "links")) == []
+
+
+class Response(object):
+    status_code = 200
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def iter_content(self, chunk_size: int = 1):
+        return iter(split(self.content, chunk_size))
+
+    def close(self):
+        pass
+
+
+def test_stream_invalid_body(monkeypatch):
+    monkeypatch.setattr(YandexWebmaster, "_resolve_user_id", lambda self: 1)
+    client = YandexWebmaster("token")
+    monkeypatch.setattr(
+        client, "_request", lambda *args, **kwargs: Response(b"<html></html>")
+    )
+    with pytest.raises(YandexWebmasterServerError) as info:
+        list(client._stream_api_request("get", "hosts", None, "hosts"))
+    assert info.value.error_code == "INVALID_RESPONSE"
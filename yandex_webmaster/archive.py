@@ -0,0 +1,226 @@
+import os
+import json
+import mmap
+import time
+import zlib
+import struct
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple, Union
+
+# timestamp, route hash, host hash, params hash, data offset, data length
+_INDEX_RECORD = struct.Struct("<dQQQQI")
+_LENGTH = struct.Struct("<I")
+
+
+@dataclass
+class ArchivedResponse(object):
+    timestamp: float
+    http_method: str
+    endpoint: str
+    params: Optional[dict]
+    response: dict
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def _params_key(params: Optional[dict]) -> str:
+    return json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def split_endpoint(endpoint: str) -> Tuple[Optional[str], str]:
+    """split endpoint to host_id and route
+
+    "user/1/hosts/https:ya.ru:443/query-analytics/list" -> ("https:ya.ru:443", "query-analytics/list")
+    "user/1/hosts" -> (None, "hosts")
+    """
+    parts = endpoint.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] == "user":
+        parts = parts[2:]
+    if len(parts) >= 2 and parts[0] == "hosts":
+        return parts[1], "/".join(parts[2:])
+    return None, "/".join(parts)
+
+
+class ResponseArchive(object):
+    """append only archive of raw api responses
+
+    Responses are stored in `responses.dat` as length prefixed zlib compressed
+    json records, `responses.idx` keeps fixed size records (timestamp, hashes of
+    route, host and params, data offset) and is read through mmap, so lookup by
+    host or endpoint touches only matching records of data file.
+
+    Args:
+        path (str): archive directory
+        compress_level (int, optional): zlib level. Defaults to 6.
+
+    Example:
+        archive = ResponseArchive("archive")
+        client = YandexWebmaster(token, archive=archive)
+        ...
+        for item in archive.replay(route="query-analytics/list", host_id=host_id):
+            print(item.timestamp, item.params, item.response)
+    """
+
+    DATA_FILE = "responses.dat"
+    INDEX_FILE = "responses.idx"
+
+    def __init__(self, path: str, compress_level: int = 6):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._data = open(os.path.join(path, self.DATA_FILE), "ab")
+        self._index = open(os.path.join(path, self.INDEX_FILE), "ab")
+        self._last_timestamp = 0.0
+        count = len(self)
+        if count:
+            index = self._index_map()
+            self._last_timestamp = self._read_index(index, count - 1)[0]
+            index.close()
+
+    def __len__(self) -> int:
+        return os.path.getsize(self._index.name) // _INDEX_RECORD.size
+
+    def close(self) -> None:
+        with self._lock:
+            self._data.close()
+            self._index.close()
+
+    def append(
+        self,
+        http_method: str,
+        endpoint: str,
+        params: Optional[dict],
+        response: Union[dict, bytes],
+        timestamp: Optional[float] = None,
+    ) -> None:
+        host_id, route = split_endpoint(endpoint)
+        timestamp = timestamp or time.time()
+        header = json.dumps(
+            {
+                "timestamp": timestamp,
+                "http_method": http_method,
+                "endpoint": endpoint,
+                "params": params,
+            },
+            ensure_ascii=False,
+            default=str,
+        ).encode("utf-8")
+        if not isinstance(response, bytes):
+            response = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        # raw body is spliced into record without decoding, compression runs
+        # without lock
+        record = zlib.compress(
+            header[:-1] + b', "response": ' + response + b"}",
+            self.compress_level,
+        )
+        with self._lock:
+            # index must be sorted by time for binary search, replay reports
+            # time of index
+            timestamp = max(timestamp, self._last_timestamp)
+            offset = self._data.tell()
+            self._data.write(_LENGTH.pack(len(record)))
+            self._data.write(record)
+            self._data.flush()
+            self._index.write(
+                _INDEX_RECORD.pack(
+                    timestamp,
+                    _hash(route),
+                    _hash(host_id or ""),
+                    _hash(_params_key(params)),
+                    offset,
+                    len(record),
+                )
+            )
+            self._index.flush()
+            self._last_timestamp = timestamp
+
+    def replay(
+        self,
+        route: Optional[str] = None,
+        host_id: Optional[str] = None,
+        params: Optional[dict] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Iterator[ArchivedResponse]:
+        """iterate archived responses in order of time
+
+        Args:
+            route (Optional[str], optional): endpoint path after host, e.g. "query-analytics/list". Defaults to None.
+            host_id (Optional[str], optional): id of host. Defaults to None.
+            params (Optional[dict], optional): exact request params. Defaults to None.
+            since (Optional[float], optional): unix timestamp from, inclusive. Defaults to None.
+            until (Optional[float], optional): unix timestamp to, exclusive. Defaults to None.
+
+        Yields:
+            ArchivedResponse: archived response
+        """
+        count = len(self)
+        if not count:
+            return
+        index = self._index_map()
+        data = self._data_map()
+        try:
+            route_hash = _hash(route) if route is not None else None
+            host_hash = _hash(host_id) if host_id is not None else None
+            params_hash = _hash(_params_key(params)) if params is not None else None
+            start = self._bisect(index, count, since) if since is not None else 0
+            stop = self._bisect(index, count, until) if until is not None else count
+            for position in range(start, stop):
+                (
+                    timestamp,
+                    record_route,
+                    record_host,
+                    record_params,
+                    offset,
+                    length,
+                ) = self._read_index(index, position)
+                if route_hash is not None and record_route != route_hash:
+                    continue
+                if host_hash is not None and record_host != host_hash:
+                    continue
+                if params_hash is not None and record_params != params_hash:
+                    continue
+                start_data = offset + _LENGTH.size
+                record = json.loads(
+                    zlib.decompress(data[start_data : start_data + length])
+                )
+                # hashes may collide, check stored values
+                record_host_id, record_route_value = split_endpoint(record["endpoint"])
+                if route is not None and record_route_value != route:
+                    continue
+                if host_id is not None and record_host_id != host_id:
+                    continue
+                record["timestamp"] = timestamp
+                yield ArchivedResponse(**record)
+        finally:
+            index.close()
+            data.close()
+
+    @staticmethod
+    def _read_index(index: mmap.mmap, position: int) -> tuple:
+        return _INDEX_RECORD.unpack_from(index, position * _INDEX_RECORD.size)
+
+    def _bisect(self, index: mmap.mmap, count: int, timestamp: float) -> int:
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self._read_index(index, middle)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _index_map(self) -> mmap.mmap:
+        with open(self._index.name, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _data_map(self) -> mmap.mmap:
+        with open(self._data.name, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
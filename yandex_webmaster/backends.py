@@ -0,0 +1,291 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _expires_at(ttl: Optional[float]) -> Optional[float]:
+    return time.time() + ttl if ttl is not None else None
+
+
+def _is_expired(expires_at: Optional[float]) -> bool:
+    return expires_at is not None and expires_at <= time.time()
+
+
+def _take_token(
+    tokens: Optional[float],
+    updated_at: float,
+    now: float,
+    rate: float,
+    capacity: float,
+) -> Tuple[float, float]:
+    """new count of tokens and seconds to wait, wait is 0 if token is taken"""
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + max(now - updated_at, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class Backend(object):
+    """state shared by clients: cache entries, counters and token buckets
+
+    Clients with the same backend (e.g. SQLiteBackend on the same file in
+    several worker processes) share user_id lookups, cached GET responses,
+    request rate limit and recrawl quota.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def get_counter(self, key: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def set_counter(self, key: str, value: int, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def add_counter(self, key: str, amount: int) -> Optional[int]:
+        """add amount to existing counter, None if counter is not set or expired"""
+        raise NotImplementedError
+
+    def take_token(self, name: str, rate: float, capacity: float) -> float:
+        """take token from bucket, return 0 if token is taken or seconds to wait"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(Backend):
+    """backend shared by clients of one process"""
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._counters: Dict[str, Tuple[int, Optional[float]]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None:
+                return None
+            if _is_expired(item[1]):
+                del self._cache[key]
+                return None
+            return item[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._cache[key] = (value, _expires_at(ttl))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def get_counter(self, key: str) -> Optional[int]:
+        with self._lock:
+            item = self._counters.get(key)
+            if item is None or _is_expired(item[1]):
+                return None
+            return item[0]
+
+    def set_counter(self, key: str, value: int, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._counters[key] = (value, _expires_at(ttl))
+
+    def add_counter(self, key: str, amount: int) -> Optional[int]:
+        with self._lock:
+            item = self._counters.get(key)
+            if item is None or _is_expired(item[1]):
+                return None
+            value = item[0] + amount
+            self._counters[key] = (value, item[1])
+            return value
+
+    def take_token(self, name: str, rate: float, capacity: float) -> float:
+        with self._lock:
+            now = time.time()
+            tokens, updated_at = self._buckets.get(name, (None, now))
+            tokens, wait = _take_token(tokens, updated_at, now, rate, capacity)
+            self._buckets[name] = (tokens, now)
+            return wait
+
+
+class SQLiteBackend(Backend):
+    """backend shared by processes of one machine through sqlite file, updates
+    of counters and token buckets run in exclusive (BEGIN IMMEDIATE)
+    transactions
+
+    Args:
+        path (str): sqlite database path
+        timeout (float, optional): seconds to wait for lock of database. Defaults to 30.0.
+
+    Example:
+        backend = SQLiteBackend("/var/run/webmaster/state.db")
+        client = YandexWebmaster(token, requests_per_second=5, backend=backend, cache_ttl=300)
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # connection is not reused in process forked after it was opened
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = (
+            self._connection()
+            .execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,))
+            .fetchone()
+        )
+        if row is None or _is_expired(row[1]):
+            return None
+        return bytes(row[0])
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, _expires_at(ttl)),
+        )
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def get_counter(self, key: str) -> Optional[int]:
+        row = (
+            self._connection()
+            .execute("SELECT value, expires_at FROM counters WHERE key = ?", (key,))
+            .fetchone()
+        )
+        if row is None or _is_expired(row[1]):
+            return None
+        return row[0]
+
+    def set_counter(self, key: str, value: int, ttl: Optional[float] = None) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO counters (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, _expires_at(ttl)),
+        )
+
+    def add_counter(self, key: str, amount: int) -> Optional[int]:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM counters WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or _is_expired(row[1]):
+                return None
+            value = row[0] + amount
+            conn.execute("UPDATE counters SET value = ? WHERE key = ?", (value, key))
+            return value
+
+    def take_token(self, name: str, rate: float, capacity: float) -> float:
+        with self._transaction() as conn:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)
+            ).fetchone()
+            tokens, updated_at = row if row is not None else (None, now)
+            tokens, wait = _take_token(tokens, updated_at, now, rate, capacity)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, tokens, now),
+            )
+            return wait
+
+    def purge(self) -> None:
+        """delete expired cache entries and counters"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+
+    def close(self) -> None:
+        """close connection of current thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SharedRateLimiter(object):
+    """token bucket limiter with state in backend, limits all clients of backend
+    which use the same bucket name
+
+    Args:
+        backend (Backend): shared state
+        name (str): bucket name
+        rate (float): requests per second
+        capacity (Optional[float], optional): bucket size. Defaults to rate.
+    """
+
+    def __init__(
+        self, backend: Backend, name: str, rate: float, capacity: Optional[float] = None
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.backend = backend
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+
+    def acquire(self) -> None:
+        while True:
+            wait = self.backend.take_token(self.name, self.rate, self.capacity)
+            if wait <= 0:
+                return
+            time.sleep(wait)
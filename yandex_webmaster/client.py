@@ -1,41 +1,353 @@
+import json
+import time
+import hashlib
+import threading
 from typing import Optional
+from contextlib import nullcontext
 from datetime import datetime
 from urllib.parse import urlencode
-from typing import List
-
-from requests import Session
-
-from .errors import YandexWebmasterError
+from typing import Any, Callable, ContextManager, Iterable, Iterator, List, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+
+from .archive import ResponseArchive
+from .backends import Backend, SharedRateLimiter
+from .errors import (
+    BaseYandexWebmasterError,
+    YandexWebmasterQuotaExceededError,
+    YandexWebmasterServerError,
+    error_from_response,
+)
+from .profiling import Profiler, ProfilingHTTPAdapter
+from .snapshot import SNAPSHOT_METHODS, HostSnapshot
+from .streaming import iter_json_array_items
+from .utils import RateLimiter
 
 
 class YandexWebmaster(object):
     API_URL = "https://api.webmaster.yandex.net/v4/"
+    STREAM_CHUNK_SIZE = 64 * 1024
+    # seconds while known recrawl quota remainder is shared through backend
+    RECRAWL_QUOTA_TTL = 3600
 
-    def __init__(self, access_token: str):
+    def __init__(
+        self,
+        access_token: str,
+        max_workers: int = 10,
+        requests_per_second: Optional[float] = None,
+        archive: Optional[ResponseArchive] = None,
+        backend: Optional[Backend] = None,
+        cache_ttl: Optional[float] = None,
+    ):
         self.set_access_token(access_token)
+        self.max_workers = max_workers
+        self.archive = archive
+        self.backend = backend
+        self.cache_ttl = cache_ttl
+        self.profiler: Optional[Profiler] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._worker_state = threading.local()
+        self._rate_limiter = self._init_rate_limiter(requests_per_second)
         self._session = self._init_session()
-        self.user_id = self.get_user_id()
+        self.user_id = self._resolve_user_id()
 
-    def _send_api_request(
-        self, http_method: str, endpoint: str, params: Optional[dict] = None
-    ) -> dict:
+    def _request(
+        self,
+        http_method: str,
+        endpoint: str,
+        params: Optional[dict] = None,
+        stream: bool = False,
+    ) -> Response:
+        if self._rate_limiter is not None:
+            with self._profile_phase("rate_limit_wait"):
+                self._rate_limiter.acquire()
         method = getattr(self._session, http_method)
         url = f"{self.API_URL}{endpoint}"
+        started_at = time.perf_counter()
         if http_method == "post":
-            response = method(url, json=params)
+            response = method(url, json=params, stream=stream)
         else:
             if params:
                 url = f"{url}?{urlencode(list(params.items()), doseq=True)}"
-            response = method(url)
+            response = method(url, stream=stream)
+        if self.profiler is not None:
+            self.profiler.add_response(response, started_at, stream)
+        return response
+
+    def _send_api_request(
+        self,
+        http_method: str,
+        endpoint: str,
+        params: Optional[dict] = None,
+        raw: bool = False,
+        cache: bool = True,
+    ) -> Union[dict, bytes]:
+        with self._profile_call(http_method, endpoint):
+            return self._send(http_method, endpoint, params, raw, cache)
+
+    def _send(
+        self,
+        http_method: str,
+        endpoint: str,
+        params: Optional[dict],
+        raw: bool,
+        cache: bool,
+    ) -> Union[dict, bytes]:
+        cache_key = self._cache_key(http_method, endpoint, params) if cache else None
+        if cache_key is not None:
+            content = self.backend.get(cache_key)
+            if content is not None:
+                return content if raw else json.loads(content)
+        response = self._request(http_method, endpoint, params)
+        if http_method != "get" and response.status_code < 400:
+            self._invalidate_cache()
         if response.status_code == 204:
-            return {}
-        json_response = response.json()
+            return b"{}" if raw else {}
         if response.status_code > 399:
-            raise YandexWebmasterError(
-                json_response["error_message"], json_response["error_code"]
+            raise error_from_response(
+                response.status_code, response.content, http_method, endpoint
+            )
+        if cache_key is not None:
+            self.backend.set(cache_key, response.content, self.cache_ttl)
+        if raw:
+            if self.archive is not None:
+                self.archive.append(http_method, endpoint, params, response.content)
+            return response.content
+        try:
+            with self._profile_decode():
+                json_response = response.json()
+        except ValueError:
+            raise YandexWebmasterServerError(
+                "response body is not valid json",
+                "INVALID_RESPONSE",
+                status_code=response.status_code,
+                http_method=http_method,
+                endpoint=endpoint,
             )
+        if self.archive is not None:
+            # body is archived as received, without encoding decoded response again
+            self.archive.append(http_method, endpoint, params, response.content)
         return json_response
 
+    def _stream_api_request(
+        self,
+        http_method: str,
+        endpoint: str,
+        params: Optional[dict],
+        items_key: str,
+    ) -> Iterator[dict]:
+        """yield items of `items_key` list while response body is downloaded,
+        streamed responses are not archived, duration of profiled call includes
+        processing of items by caller"""
+        with self._profile_call(http_method, endpoint):
+            response = self._request(http_method, endpoint, params, stream=True)
+            try:
+                if response.status_code == 204:
+                    return
+                if response.status_code > 399:
+                    raise error_from_response(
+                        response.status_code, response.content, http_method, endpoint
+                    )
+                chunks = response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE)
+                if self.profiler is not None:
+                    chunks = self.profiler.download(chunks)
+                yield from iter_json_array_items(chunks, items_key)
+            except ValueError:
+                raise YandexWebmasterServerError(
+                    "response body is not valid json",
+                    "INVALID_RESPONSE",
+                    status_code=response.status_code,
+                    http_method=http_method,
+                    endpoint=endpoint,
+                )
+            finally:
+                response.close()
+
+    def _cache_key(
+        self, http_method: str, endpoint: str, params: Optional[dict]
+    ) -> Optional[str]:
+        if self.backend is None or self.cache_ttl is None or http_method != "get":
+            return None
+        generation = self.backend.get_counter(f"cache_generation:{self._token_key}")
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        return f"response:{self._token_key}:{generation or 0}:{endpoint}?{query}"
+
+    def _invalidate_cache(self) -> None:
+        """cached responses of token are dropped after any change (add_host,
+        add_sitemap, ...) by switching generation of cache keys"""
+        if self.backend is None or self.cache_ttl is None:
+            return
+        self.backend.set_counter(f"cache_generation:{self._token_key}", time.time_ns())
+
+    @property
+    def _token_key(self) -> str:
+        # shared keys are per token, raw token is not stored in backend
+        return hashlib.sha1(self.access_token.encode("utf-8")).hexdigest()[:16]
+
+    def _resolve_user_id(self) -> int:
+        if self.backend is None:
+            return self.get_user_id()
+        key = f"user_id:{self._token_key}"
+        user_id = self.backend.get_counter(key)
+        if user_id is None:
+            user_id = self.get_user_id()
+            self.backend.set_counter(key, user_id)
+        return user_id
+
+    def _init_rate_limiter(
+        self, requests_per_second: Optional[float]
+    ) -> Union[RateLimiter, SharedRateLimiter, None]:
+        if not requests_per_second:
+            return None
+        if self.backend is not None:
+            return SharedRateLimiter(
+                self.backend, f"rate:{self._token_key}", requests_per_second
+            )
+        return RateLimiter(requests_per_second)
+
+    def enable_profiling(self, trace_allocations: bool = True) -> Profiler:
+        """record timing of request phases of every call (see profiling.Profiler),
+        session connections are replaced by timed ones
+        Args:
+            trace_allocations (bool, optional): count allocations of json decoding. Defaults to True.
+
+        Returns:
+            Profiler: profiler with records of calls
+        """
+        self.disable_profiling()
+        self.profiler = Profiler(trace_allocations=trace_allocations)
+        adapter = ProfilingHTTPAdapter(pool_maxsize=self.max_workers)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        return self.profiler
+
+    def disable_profiling(self) -> Optional[Profiler]:
+        """stop recording of calls, plain session connections are restored
+        Returns:
+            Optional[Profiler]: stopped profiler with records, None if profiling was not enabled
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return None
+        self.profiler = None
+        profiler.stop()
+        adapter = HTTPAdapter(pool_maxsize=self.max_workers)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        return profiler
+
+    def _profile_call(self, http_method: str, endpoint: str) -> ContextManager:
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.call(http_method, endpoint)
+
+    def _profile_phase(self, name: str) -> ContextManager:
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(name)
+
+    def _profile_decode(self) -> ContextManager:
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.decode()
+
+    def _map(self, func: Callable, items: Iterable) -> List[Any]:
+        items = list(items)
+        if len(items) < 2 or self.max_workers < 2:
+            return [func(item) for item in items]
+        if self._is_worker():
+            # waiting for shared pool from its own worker may deadlock
+            workers = min(self.max_workers, len(items))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(func, items))
+        funcs = [func] * len(items)
+        return list(self._get_executor().map(self._run_in_worker, funcs, items))
+
+    def _is_worker(self) -> bool:
+        return getattr(self._worker_state, "active", False)
+
+    def _run_in_worker(self, func: Callable, *args, **kwargs) -> Any:
+        self._worker_state.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._worker_state.active = False
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="yandex-webmaster"
+                )
+            return self._executor
+
+    def submit(self, method: Union[str, Callable], *args, **kwargs) -> Future:
+        """run client method in background thread pool
+        Args:
+            method (Union[str, Callable]): name of client method or callable
+            *args: method args
+            **kwargs: method kwargs
+
+        Returns:
+            Future: future of method result
+
+        Example:
+            future = client.submit("get_host", host_id)
+            host = future.result()
+        """
+        func = getattr(self, method) if isinstance(method, str) else method
+        return self._get_executor().submit(self._run_in_worker, func, *args, **kwargs)
+
+    def batch(
+        self, calls: Iterable[tuple], return_exceptions: bool = False
+    ) -> List[Any]:
+        """run many client methods concurrently and wait for results
+        Args:
+            calls (Iterable[tuple]): (method, args) or (method, args, kwargs), method is name of client method or callable
+            return_exceptions (bool, optional): return exception of failed call instead of raising. Defaults to False.
+
+        Returns:
+            List[Any]: results in order of calls
+
+        Example:
+            host, sitemaps = client.batch([
+                ("get_host", (host_id,)),
+                ("get_sitemaps", (host_id,), {"limit": 100}),
+            ])
+        """
+        futures = []
+        for call in calls:
+            method, args = call[0], call[1]
+            kwargs = call[2] if len(call) > 2 else {}
+            futures.append(self.submit(method, *args, **kwargs))
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        self.disable_profiling()
+        self._session.close()
+
+    def __enter__(self) -> "YandexWebmaster":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
     def get_user_id(self) -> dict:
         response = self._send_api_request("get", "user")
         return response["user_id"]
@@ -194,6 +506,101 @@ class YandexWebmaster(object):
         response = self._send_api_request("get", endpoint, params)
         return response
 
+    def get_search_queries_history_batch(
+        self,
+        host_id: str,
+        query_ids: List[str],
+        query_indicator: List[str],
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        device_type_indicator: Optional[str] = None,
+    ) -> dict:
+        """get history of many search queries concurrently
+        (see get_single_search_query_history), requests run in `max_workers` threads
+        and respect `requests_per_second` of client. Error of one query is stored
+        in "errors" and its values are None, other queries are still returned
+        Args:
+            host_id (str): site_id
+            query_ids (List[str]): query ids
+            query_indicator (List[str]): TOTAL_SHOWS or TOTAL_CLICKS.
+            date_from (Optional[datetime], optional): datetime. Defaults to None.
+            date_to (Optional[datetime], optional): datetime. Defaults to None.
+            device_type_indicator (Optional[str], optional): ALL or TABLET or MOBILE or DESKTOP or MOBILE_AND_TABLET. Defaults to None.
+        Returns:
+            dict: {
+                "dates": ["2019-07-18T00:00:00.000+03:00", ...],
+                "queries": [
+                    {
+                        "query_id": "a08b",
+                        "query_text": "some text"
+                    }, ...
+                ],
+                "indicators": {
+                    "TOTAL_SHOWS": [
+                        [2.0, ...], # values of first query by dates, None if missing
+                        ...
+                    ]
+                },
+                "errors": {
+                    "b19c": YandexWebmasterNotFoundError(...) # failed queries
+                }
+            }
+        """
+
+        def fetch(query_id: str) -> Union[dict, Exception]:
+            try:
+                return self.get_single_search_query_history(
+                    host_id,
+                    query_id,
+                    query_indicator,
+                    date_from=date_from,
+                    date_to=date_to,
+                    device_type_indicator=device_type_indicator,
+                )
+            except (BaseYandexWebmasterError, RequestException) as e:
+                return e
+
+        responses = self._map(fetch, query_ids)
+        queries = []
+        dates = set()
+        errors = {}
+        for query_id, response in zip(query_ids, responses):
+            if isinstance(response, Exception):
+                errors[query_id] = response
+                response = {"query_id": query_id}
+            query = response.get("queries", [response])
+            query = query[0] if query else {}
+            indicators = query.get("indicators", {})
+            for points in indicators.values():
+                dates.update(point["date"] for point in points)
+            queries.append(
+                {
+                    "query_id": query.get("query_id", query_id),
+                    "query_text": query.get("query_text"),
+                    "indicators": indicators,
+                }
+            )
+        sorted_dates = sorted(dates)
+        date_index = {date: i for i, date in enumerate(sorted_dates)}
+        matrix = {}
+        for indicator in query_indicator:
+            rows = []
+            for query in queries:
+                row = [None] * len(sorted_dates)
+                for point in query["indicators"].get(indicator, []):
+                    row[date_index[point["date"]]] = point["value"]
+                rows.append(row)
+            matrix[indicator] = rows
+        return {
+            "dates": sorted_dates,
+            "queries": [
+                {"query_id": q["query_id"], "query_text": q["query_text"]}
+                for q in queries
+            ],
+            "indicators": matrix,
+            "errors": errors,
+        }
+
     def get_list_query_analytics(
         self,
         host_id: str,
@@ -204,7 +611,9 @@ class YandexWebmaster(object):
         region_ids: Optional[list] = None,
         filters: Optional[dict] = None,
         sort_by_date: Optional[dict] = None,
-    ) -> dict:
+        raw: bool = False,
+        stream: bool = False,
+    ) -> Union[dict, bytes, Iterator[dict]]:
         """list query analytics
         DOC: https://yandex.ru/dev/webmaster/doc/dg/reference/host-query-analytics.html
 
@@ -217,6 +626,8 @@ class YandexWebmaster(object):
             region_ids (Optional[list], optional): regions. Defaults to None.
             filters (Optional[dict], optional): filters. Defaults to None.
             sort_by_date (Optional[dict], optional): sort data. Defaults to None.
+            raw (bool, optional): return response body bytes without decoding. Defaults to False.
+            stream (bool, optional): return iterator of "text_indicator_to_statistics" items parsed while body is downloaded. Defaults to False.
 
         Returns:
             dict: {
@@ -264,7 +675,13 @@ class YandexWebmaster(object):
             data["filters"] = filters
         if sort_by_date:
             data["sort_by_date"] = sort_by_date
-        response = self._send_api_request("post", endpoint=endpoint, params=data)
+        if stream:
+            return self._stream_api_request(
+                "post", endpoint, data, "text_indicator_to_statistics"
+            )
+        response = self._send_api_request(
+            "post", endpoint=endpoint, params=data, raw=raw
+        )
         return response
 
     def get_host(self, host_id: str) -> dict:
@@ -325,6 +742,52 @@ class YandexWebmaster(object):
         response = self._send_api_request("get", endpoint, params)
         return response
 
+    def get_host_snapshot(self, host_id: str) -> HostSnapshot:
+        """get host info, indexing stats, diagnostics, recrawl quota, sqi history
+        and external links history concurrently, failed requests are stored in
+        snapshot errors
+        Args:
+            host_id (str): id of host
+
+        Returns:
+            HostSnapshot: snapshot
+        """
+        return self.get_hosts_snapshots([host_id])[0]
+
+    def get_hosts_snapshots(
+        self, host_ids: Optional[List[str]] = None
+    ) -> List[HostSnapshot]:
+        """get snapshots of many hosts (see get_host_snapshot), all requests of all
+        hosts share client thread pool
+        Args:
+            host_ids (Optional[List[str]], optional): ids of hosts, all user hosts if None. Defaults to None.
+
+        Returns:
+            List[HostSnapshot]: snapshots in order of host_ids
+        """
+        if host_ids is None:
+            host_ids = [host["host_id"] for host in self.get_hosts()]
+        calls = [
+            (host_id, name, method)
+            for host_id in host_ids
+            for name, method in SNAPSHOT_METHODS.items()
+        ]
+
+        def call(item: tuple) -> Any:
+            host_id, _, method = item
+            try:
+                return getattr(self, method)(host_id)
+            except (BaseYandexWebmasterError, RequestException) as e:
+                return e
+
+        snapshots = {host_id: HostSnapshot(host_id) for host_id in host_ids}
+        for (host_id, name, _), result in zip(calls, self._map(call, calls)):
+            if isinstance(result, Exception):
+                snapshots[host_id].errors[name] = result
+            else:
+                setattr(snapshots[host_id], name, result)
+        return [snapshots[host_id] for host_id in host_ids]
+
     def add_host(self, host_url: str) -> dict:
         """add site to webmaster
         DOC: https://yandex.ru/dev/webmaster/doc/dg/reference/hosts-add-site.html
@@ -555,14 +1018,15 @@ class YandexWebmaster(object):
         return response
 
     def get_indexing_samples(
-        self, host_id: str, limit: int = 100, offset: int = 0
-    ) -> dict:
+        self, host_id: str, limit: int = 100, offset: int = 0, stream: bool = False
+    ) -> Union[dict, Iterator[dict]]:
         """get indexing samples
         DOC: https://yandex.ru/dev/webmaster/doc/dg/reference/hosts-indexing-samples.html
         Args:
             host_id (str): id of host
             limit (int, optional): row limit. Defaults to 100.
             offset (int, optional): offset limit. Defaults to 0.
+            stream (bool, optional): return iterator of "samples" items parsed while body is downloaded. Defaults to False.
 
         Returns:
             dict: {
@@ -582,6 +1046,8 @@ class YandexWebmaster(object):
             "limit": limit,
             "offset": offset,
         }
+        if stream:
+            return self._stream_api_request("get", endpoint, params, "samples")
         response = self._send_api_request("get", endpoint, params)
         return response
 
@@ -686,14 +1152,15 @@ class YandexWebmaster(object):
         return response
 
     def get_insearch_url_samples(
-        self, host_id: str, limit: int = 100, offset: int = 0
-    ) -> dict:
+        self, host_id: str, limit: int = 100, offset: int = 0, stream: bool = False
+    ) -> Union[dict, Iterator[dict]]:
         """get insearch url samples
         DOC: https://yandex.ru/dev/webmaster/doc/dg/reference/hosts-indexing-insearch-samples.html
         Args:
             host_id (str): id of host
             limit (int, optional): limit rows. Defaults to 100.
             offset (int, optional): offset rows. Defaults to 0.
+            stream (bool, optional): return iterator of "samples" items parsed while body is downloaded. Defaults to False.
 
         Returns:
             dict: {
@@ -712,6 +1179,8 @@ class YandexWebmaster(object):
             "limit": limit,
             "offset": offset,
         }
+        if stream:
+            return self._stream_api_request("get", endpoint, params, "samples")
         response = self._send_api_request("get", endpoint, params)
         return response
 
@@ -746,14 +1215,15 @@ class YandexWebmaster(object):
         return response
 
     def get_insearch_url_events_samples(
-        self, host_id: str, limit: int = 100, offset: int = 0
-    ) -> dict:
+        self, host_id: str, limit: int = 100, offset: int = 0, stream: bool = False
+    ) -> Union[dict, Iterator[dict]]:
         """get insearch url samples
         DOC: https://yandex.ru/dev/webmaster/doc/dg/reference/hosts-search-events-samples.html
         Args:
             host_id (str): id of host
             limit (int, optional): limit rows. Defaults to 100.
             offset (int, optional): offset rows. Defaults to 0.
+            stream (bool, optional): return iterator of "samples" items parsed while body is downloaded. Defaults to False.
 
         Returns:
             dict: {
@@ -772,6 +1242,8 @@ class YandexWebmaster(object):
             "limit": limit,
             "offset": offset,
         }
+        if stream:
+            return self._stream_api_request("get", endpoint, params, "samples")
         response = self._send_api_request("get", endpoint, params)
         return response
 
@@ -792,7 +1264,31 @@ class YandexWebmaster(object):
         params = {
             "url": url,
         }
-        response = self._send_api_request("post", endpoint, params)
+        if self.backend is None:
+            return self._send_api_request("post", endpoint, params)
+        quota_key = f"recrawl_quota:{self._token_key}:{host_id}"
+        # reserve one url of shared quota remainder before request
+        remainder = self.backend.add_counter(quota_key, -1)
+        if remainder is not None and remainder < 0:
+            self.backend.add_counter(quota_key, 1)
+            raise YandexWebmasterQuotaExceededError(
+                "recrawl quota is exhausted",
+                "QUOTA_EXCEEDED",
+                http_method="post",
+                endpoint=endpoint,
+            )
+        try:
+            response = self._send_api_request("post", endpoint, params)
+        except (BaseYandexWebmasterError, RequestException) as e:
+            if isinstance(e, YandexWebmasterQuotaExceededError) and not e.is_transient:
+                self.backend.set_counter(quota_key, 0, self.RECRAWL_QUOTA_TTL)
+            elif remainder is not None:
+                self.backend.add_counter(quota_key, 1)
+            raise
+        if "quota_remainder" in response:
+            self.backend.set_counter(
+                quota_key, response["quota_remainder"], self.RECRAWL_QUOTA_TTL
+            )
         return response
 
     def get_recrawl_task(self, host_id: str, task_id: str) -> dict:
@@ -821,7 +1317,8 @@ class YandexWebmaster(object):
         date_to: datetime,
         limit: int = 100,
         offset: int = 0,
-    ) -> dict:
+        stream: bool = False,
+    ) -> Union[dict, Iterator[dict]]:
         """get recrawl tasks
         DOC: https://yandex.ru/dev/webmaster/doc/dg/reference/host-recrawl-get.html
         Args:
@@ -830,6 +1327,7 @@ class YandexWebmaster(object):
             date_to (datetime): date to
             limit (int, optional): limit rows. Defaults to 100.
             offset (int, optional): offset rows. Defaults to 0.
+            stream (bool, optional): return iterator of "tasks" items parsed while body is downloaded. Defaults to False.
 
         Returns:
             dict: {
@@ -850,6 +1348,8 @@ class YandexWebmaster(object):
             "limit": limit,
             "offset": offset,
         }
+        if stream:
+            return self._stream_api_request("get", endpoint, params, "tasks")
         response = self._send_api_request("get", endpoint, params)
         return response
 
@@ -866,7 +1366,14 @@ class YandexWebmaster(object):
             }
         """
         endpoint = f"user/{self.user_id}/hosts/{host_id}/recrawl/quota"
-        response = self._send_api_request("get", endpoint)
+        # shared remainder is set only from fresh response, never from cache
+        response = self._send_api_request("get", endpoint, cache=False)
+        if self.backend is not None and "quota_remainder" in response:
+            self.backend.set_counter(
+                f"recrawl_quota:{self._token_key}:{host_id}",
+                response["quota_remainder"],
+                self.RECRAWL_QUOTA_TTL,
+            )
         return response
 
     def diagnostic_site(self, host_id: str) -> dict:
@@ -891,8 +1398,13 @@ class YandexWebmaster(object):
         return response
 
     def get_broken_internal_links_samples(
-        self, host_id: str, indicator: str, limit: int = 100, offset: int = 0
-    ) -> dict:
+        self,
+        host_id: str,
+        indicator: str,
+        limit: int = 100,
+        offset: int = 0,
+        stream: bool = False,
+    ) -> Union[dict, Iterator[dict]]:
         """get broken internal links samples
         DOC: https://yandex.ru/dev/webmaster/doc/dg/reference/host-links-internal-samples.html
         Args:
@@ -900,6 +1412,7 @@ class YandexWebmaster(object):
             indicator (str): must be ON OF (SITE_ERROR, DISALLOWED_BY_USER, UNSUPPORTED_BY_ROBOT)
             limit (int, optional): limit rows. Defaults to 100.
             offset (int, optional): offset rows. Defaults to 0.
+            stream (bool, optional): return iterator of "links" items parsed while body is downloaded. Defaults to False.
 
         Returns:
             dict: {
@@ -916,6 +1429,8 @@ class YandexWebmaster(object):
         """
         endpoint = f"user/{self.user_id}/hosts/{host_id}/links/internal/broken/samples"
         params = {"limit": limit, "offset": offset, "indicator": indicator}
+        if stream:
+            return self._stream_api_request("get", endpoint, params, "links")
         response = self._send_api_request("get", endpoint, params)
         return response
 
@@ -950,14 +1465,21 @@ class YandexWebmaster(object):
         return response
 
     def get_external_links_samples(
-        self, host_id: str, limit: int = 100, offset: int = 0
-    ) -> dict:
+        self,
+        host_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        raw: bool = False,
+        stream: bool = False,
+    ) -> Union[dict, bytes, Iterator[dict]]:
         """get external links samples
         DOC: https://yandex.ru/dev/webmaster/doc/dg/reference/host-links-external-samples.html
         Args:
             host_id (str): id of host
             limit (int, optional): limit rows. Defaults to 100.
             offset (int, optional): offset rows. Defaults to 0.
+            raw (bool, optional): return response body bytes without decoding. Defaults to False.
+            stream (bool, optional): return iterator of "links" items parsed while body is downloaded. Defaults to False.
 
         Returns:
             dict: {
@@ -977,7 +1499,9 @@ class YandexWebmaster(object):
             "limit": limit,
             "offset": offset,
         }
-        response = self._send_api_request("get", endpoint, params)
+        if stream:
+            return self._stream_api_request("get", endpoint, params, "links")
+        response = self._send_api_request("get", endpoint, params, raw=raw)
         return response
 
     def get_external_links_history(self, host_id: str) -> dict:
@@ -1005,6 +1529,9 @@ class YandexWebmaster(object):
     def _init_session(self) -> Session:
         session = Session()
         session.headers.update({"Authorization": f"OAuth {self.access_token}"})
+        adapter = HTTPAdapter(pool_maxsize=self.max_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
         return session
 
     @property
@@ -0,0 +1,419 @@
+import os
+import sys
+import json
+import time
+import heapq
+import signal
+import logging
+import argparse
+import itertools
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import Future, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .archive import ResponseArchive
+from .client import YandexWebmaster
+from .errors import is_transient_error
+from .snapshot import SNAPSHOT_METHODS
+
+logger = logging.getLogger(__name__)
+
+# client methods with only host_id param
+DEFAULT_METHODS = tuple(SNAPSHOT_METHODS.values())
+
+HOT = 0
+COLD = 1
+
+# seconds before retry of method whose concurrency limit is reached
+BUSY_RETRY_DELAY = 1.0
+
+
+@dataclass(order=True)
+class SyncTask(object):
+    due_at: float
+    seq: int
+    host_id: str = field(compare=False)
+    methods: Tuple[str, ...] = field(compare=False)
+
+
+class SyncDaemon(object):
+    """long running sync of hosts with priority queue of due tasks
+
+    Every hot (host, method) pair is a separate task refreshed each
+    `hot_interval` seconds, cold methods of a host are one task refreshed each
+    `cold_interval`. Due hot tasks run before cold ones. Calls of one method
+    are limited by `concurrency` (default `default_concurrency`), all calls by
+    client `max_workers` and `requests_per_second`. Finish time of every
+    (host, method) is saved to `checkpoint_path`, so after restart only calls
+    which are due are made. Transient errors are retried with backoff.
+
+    Responses are passed to `handler(host_id, method, response)` and archived
+    by client when it has `archive`.
+
+    Args:
+        client (YandexWebmaster): api client
+        methods (Iterable[str], optional): client methods with only host_id param. Defaults to DEFAULT_METHODS.
+        host_ids (Optional[Iterable[str]], optional): hosts, verified hosts of get_hosts if None. Defaults to None.
+        hot_hosts (Iterable[str], optional): hosts whose methods are all hot. Defaults to ().
+        hot_methods (Iterable[str], optional): methods which are hot for all hosts. Defaults to ().
+        hot_interval (float, optional): seconds between syncs of hot pairs. Defaults to 900.0.
+        cold_interval (float, optional): seconds between syncs of cold pairs. Defaults to 21600.0.
+        concurrency (Optional[Dict[str, int]], optional): method -> max concurrent calls. Defaults to None.
+        default_concurrency (int, optional): max concurrent calls of other methods. Defaults to 2.
+        checkpoint_path (Optional[str], optional): json file with finish times. Defaults to None.
+        handler (Optional[Callable[[str, str, dict], None]], optional): called with every response. Defaults to None.
+        hosts_refresh_interval (float, optional): seconds between get_hosts calls. Defaults to 3600.0.
+        retry_delay (float, optional): first delay of retry after transient error. Defaults to 60.0.
+        checkpoint_interval (float, optional): min seconds between checkpoint writes. Defaults to 10.0.
+
+    Example:
+        daemon = SyncDaemon(client, hot_hosts=[host_id], checkpoint_path="sync.json", handler=save)
+        daemon.run()  # until SIGTERM, SIGINT or daemon.stop()
+    """
+
+    def __init__(
+        self,
+        client: YandexWebmaster,
+        methods: Iterable[str] = DEFAULT_METHODS,
+        host_ids: Optional[Iterable[str]] = None,
+        hot_hosts: Iterable[str] = (),
+        hot_methods: Iterable[str] = (),
+        hot_interval: float = 900.0,
+        cold_interval: float = 21600.0,
+        concurrency: Optional[Dict[str, int]] = None,
+        default_concurrency: int = 2,
+        checkpoint_path: Optional[str] = None,
+        handler: Optional[Callable[[str, str, dict], None]] = None,
+        hosts_refresh_interval: float = 3600.0,
+        retry_delay: float = 60.0,
+        checkpoint_interval: float = 10.0,
+    ):
+        self.client = client
+        self.methods = tuple(methods)
+        for method in self.methods:
+            if not callable(getattr(client, method, None)):
+                raise ValueError(f"unknown client method: {method}")
+        self.host_ids = list(host_ids) if host_ids is not None else None
+        self.hot_hosts = set(hot_hosts)
+        self.hot_methods = set(hot_methods)
+        self.hot_interval = hot_interval
+        self.cold_interval = cold_interval
+        self.checkpoint_path = checkpoint_path
+        self.handler = handler
+        self.hosts_refresh_interval = hosts_refresh_interval
+        self.retry_delay = retry_delay
+        self.checkpoint_interval = checkpoint_interval
+        concurrency = concurrency or {}
+        self._semaphores = {
+            method: threading.BoundedSemaphore(
+                concurrency.get(method, default_concurrency)
+            )
+            for method in self.methods
+        }
+        # host_id -> method -> finish time of last sync
+        self.checkpoints: Dict[str, Dict[str, float]] = {}
+        self._retry_at: Dict[Tuple[str, str], float] = {}
+        self._attempts: Dict[Tuple[str, str], int] = {}
+        # due hot tasks are dispatched before due cold tasks
+        self._queues: Dict[int, List[SyncTask]] = {HOT: [], COLD: []}
+        self._seq = itertools.count()
+        self._hosts: Set[str] = set()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(client.max_workers)
+        self._running: Set[Future] = set()
+        self._stop = threading.Event()
+        self._dirty = False
+        self._saved_at = 0.0
+        self._hosts_refresh_at = 0.0
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                self.checkpoints = json.load(f)
+
+    def is_hot(self, host_id: str, method: str) -> bool:
+        return host_id in self.hot_hosts or method in self.hot_methods
+
+    def due_at(self, host_id: str, method: str) -> float:
+        retry_at = self._retry_at.get((host_id, method))
+        if retry_at is not None:
+            return retry_at
+        finished_at = self.checkpoints.get(host_id, {}).get(method)
+        if finished_at is None:
+            return 0.0
+        interval = (
+            self.hot_interval if self.is_hot(host_id, method) else self.cold_interval
+        )
+        return finished_at + interval
+
+    def stop(self) -> None:
+        """stop dispatching, running calls are finished and checkpoint is saved"""
+        self._stop.set()
+
+    def run(self) -> None:
+        """dispatch due tasks until stop, SIGTERM and SIGINT stop daemon when
+        it runs in main thread"""
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, self._on_signal)
+        try:
+            while not self._stop.is_set():
+                self._refresh_hosts()
+                task = self._pop_due()
+                if task is None:
+                    self._save()
+                    self._stop.wait(self._wait_time())
+                    continue
+                if not self._acquire_slot():
+                    self._push(task)
+                    break
+                future = self.client.submit(self._run_task, task)
+                with self._lock:
+                    self._running.add(future)
+                future.add_done_callback(self._on_done)
+                self._save()
+        finally:
+            with self._lock:
+                running = list(self._running)
+            wait(running)
+            self._save(force=True)
+            logger.info("sync daemon stopped")
+
+    def _on_signal(self, signum, frame) -> None:
+        logger.info("signal %s received, stopping", signum)
+        self.stop()
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            self._running.discard(future)
+        self._slots.release()
+        if future.exception() is not None:
+            logger.error("sync task failed", exc_info=future.exception())
+
+    def _acquire_slot(self) -> bool:
+        while not self._slots.acquire(timeout=1.0):
+            if self._stop.is_set():
+                return False
+        return True
+
+    def _wait_time(self) -> float:
+        with self._lock:
+            dues = [queue[0].due_at for queue in self._queues.values() if queue]
+        wait_time = min(dues) - time.time() if dues else 1.0
+        # tasks are pushed back by workers, queue is checked at least every second
+        return min(max(wait_time, 0.0), 1.0)
+
+    def _refresh_hosts(self) -> None:
+        now = time.time()
+        if now < self._hosts_refresh_at:
+            return
+        self._hosts_refresh_at = now + self.hosts_refresh_interval
+        if self.host_ids is not None:
+            host_ids = set(self.host_ids)
+        else:
+            try:
+                hosts = self.client.get_hosts()
+            except Exception as e:
+                if not is_transient_error(e):
+                    raise
+                logger.warning("get_hosts failed: %s", e)
+                self._hosts_refresh_at = now + self.retry_delay
+                return
+            host_ids = {host["host_id"] for host in hosts if host.get("verified")}
+        with self._lock:
+            added = host_ids - self._hosts
+            self._hosts = host_ids
+        for host_id in sorted(added):
+            self._schedule_host(host_id)
+        if added:
+            logger.info("%s hosts added to sync", len(added))
+
+    def _schedule_host(self, host_id: str) -> None:
+        cold_methods = []
+        for method in self.methods:
+            if self.is_hot(host_id, method):
+                self._push_methods(host_id, (method,))
+            else:
+                cold_methods.append(method)
+        if cold_methods:
+            self._push_methods(host_id, tuple(cold_methods))
+
+    def _push_methods(self, host_id: str, methods: Tuple[str, ...]) -> None:
+        due_at = min(self.due_at(host_id, method) for method in methods)
+        self._push(SyncTask(due_at, next(self._seq), host_id, methods))
+
+    def _push(self, task: SyncTask) -> None:
+        priority = HOT if self.is_hot(task.host_id, task.methods[0]) else COLD
+        with self._lock:
+            heapq.heappush(self._queues[priority], task)
+
+    def _pop_due(self) -> Optional[SyncTask]:
+        """due task with earliest due time, hot before cold"""
+        now = time.time()
+        with self._lock:
+            for priority in (HOT, COLD):
+                queue = self._queues[priority]
+                while queue and queue[0].due_at <= now:
+                    task = heapq.heappop(queue)
+                    # tasks of deleted hosts are dropped
+                    if task.host_id in self._hosts:
+                        return task
+        return None
+
+    def _run_task(self, task: SyncTask) -> None:
+        for method in task.methods:
+            if self._stop.is_set():
+                break
+            if self.due_at(task.host_id, method) > time.time():
+                continue
+            semaphore = self._semaphores[method]
+            if not semaphore.acquire(blocking=False):
+                self._retry_at[(task.host_id, method)] = time.time() + BUSY_RETRY_DELAY
+                continue
+            try:
+                self._call(task.host_id, method)
+            finally:
+                semaphore.release()
+        with self._lock:
+            active = task.host_id in self._hosts
+        if active:
+            self._push_methods(task.host_id, task.methods)
+
+    def _call(self, host_id: str, method: str) -> None:
+        try:
+            response = getattr(self.client, method)(host_id)
+        except Exception as e:
+            if not is_transient_error(e):
+                # e.g. host is not verified, call is repeated in next interval
+                logger.error("%s %s failed: %s", method, host_id, e)
+                self._finish(host_id, method)
+                return
+            self._retry(host_id, method, e)
+            return
+        if self.handler is not None:
+            try:
+                self.handler(host_id, method, response)
+            except Exception as e:
+                # e.g. storage of handler is unavailable
+                self._retry(host_id, method, e)
+                return
+        self._finish(host_id, method)
+
+    def _retry(self, host_id: str, method: str, error: Exception) -> None:
+        key = (host_id, method)
+        attempts = self._attempts.get(key, 0)
+        interval = (
+            self.hot_interval if self.is_hot(host_id, method) else self.cold_interval
+        )
+        delay = min(self.retry_delay * 2**attempts, interval)
+        self._attempts[key] = attempts + 1
+        self._retry_at[key] = time.time() + delay
+        logger.warning(
+            "%s %s failed, retry in %.0fs: %s", method, host_id, delay, error
+        )
+
+    def _finish(self, host_id: str, method: str) -> None:
+        self._retry_at.pop((host_id, method), None)
+        self._attempts.pop((host_id, method), None)
+        with self._lock:
+            self.checkpoints.setdefault(host_id, {})[method] = time.time()
+            self._dirty = True
+
+    def _save(self, force: bool = False) -> None:
+        if self.checkpoint_path is None:
+            return
+        now = time.time()
+        with self._lock:
+            if not self._dirty or (
+                not force and now - self._saved_at < self.checkpoint_interval
+            ):
+                return
+            data = json.dumps(self.checkpoints)
+            self._dirty = False
+            self._saved_at = now
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+def _concurrency(values: List[str]) -> Dict[str, int]:
+    concurrency = {}
+    for value in values:
+        method, _, limit = value.partition("=")
+        concurrency[method] = int(limit)
+    return concurrency
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """command line entry point of sync daemon"""
+    parser = argparse.ArgumentParser(
+        prog="yandex-webmaster-sync",
+        description="keep data of webmaster hosts fresh, responses are stored in archive",
+    )
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("YANDEX_WEBMASTER_TOKEN"),
+        help="oauth token, YANDEX_WEBMASTER_TOKEN by default",
+    )
+    parser.add_argument("--archive", help="directory of response archive")
+    parser.add_argument(
+        "--checkpoint", default="webmaster_sync.json", help="checkpoint file"
+    )
+    parser.add_argument(
+        "--method",
+        action="append",
+        dest="methods",
+        help="client method with only host_id param, repeatable",
+    )
+    parser.add_argument("--host", action="append", dest="host_ids", help="host_id")
+    parser.add_argument("--hot-host", action="append", default=[], help="hot host_id")
+    parser.add_argument("--hot-method", action="append", default=[], help="hot method")
+    parser.add_argument("--hot-interval", type=float, default=900.0)
+    parser.add_argument("--cold-interval", type=float, default=21600.0)
+    parser.add_argument(
+        "--concurrency",
+        action="append",
+        default=[],
+        metavar="METHOD=N",
+        help="max concurrent calls of method",
+    )
+    parser.add_argument("--default-concurrency", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--requests-per-second", type=float, default=None)
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error("--token or YANDEX_WEBMASTER_TOKEN is required")
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    archive = ResponseArchive(args.archive) if args.archive else None
+    try:
+        with YandexWebmaster(
+            args.token,
+            max_workers=args.workers,
+            requests_per_second=args.requests_per_second,
+            archive=archive,
+        ) as client:
+            daemon = SyncDaemon(
+                client,
+                methods=args.methods or DEFAULT_METHODS,
+                host_ids=args.host_ids,
+                hot_hosts=args.hot_host,
+                hot_methods=args.hot_method,
+                hot_interval=args.hot_interval,
+                cold_interval=args.cold_interval,
+                concurrency=_concurrency(args.concurrency),
+                default_concurrency=args.default_concurrency,
+                checkpoint_path=args.checkpoint,
+            )
+            daemon.run()
+    finally:
+        if archive is not None:
+            archive.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,129 @@
+import json
+from typing import Optional
+
+from requests.exceptions import RequestException
+
+
 class BaseYandexWebmasterError(Exception):
-    def __init__(self, error_message: str, error_code: str, *args):
+    is_transient = False
+
+    def __init__(
+        self,
+        error_message: str,
+        error_code: str,
+        *args,
+        status_code: Optional[int] = None,
+        http_method: Optional[str] = None,
+        endpoint: Optional[str] = None,
+    ):
         super().__init__(*args)
         self.error_message = error_message
         self.error_code = error_code
+        self.status_code = status_code
+        self.http_method = http_method
+        self.endpoint = endpoint
 
     def __str__(self):
-        return f'error_code: {self.error_code}, error_message: {self.error_message}'
+        message = f'error_code: {self.error_code}, error_message: {self.error_message}'
+        if self.status_code is not None:
+            message = f'{message}, status_code: {self.status_code}'
+        if self.endpoint is not None:
+            message = f'{message}, request: {(self.http_method or "").upper()} {self.endpoint}'
+        return message
 
     def dict(self) -> dict:
-        return {'error_message': self.error_message, 'error_code': self.error_code}
+        return {
+            'error_message': self.error_message,
+            'error_code': self.error_code,
+            'status_code': self.status_code,
+            'http_method': self.http_method,
+            'endpoint': self.endpoint,
+            'is_transient': self.is_transient,
+        }
 
 
 class YandexWebmasterError(BaseYandexWebmasterError):
     pass
+
+
+class YandexWebmasterAuthError(YandexWebmasterError):
+    """invalid token or access to resource is forbidden (401, 403)"""
+
+
+class YandexWebmasterNotFoundError(YandexWebmasterError):
+    """host, sitemap or other resource not found (404)"""
+
+
+class YandexWebmasterValidationError(YandexWebmasterError):
+    """invalid request params or conflicting state (400, 405, 409, 410, 415, 422)"""
+
+
+class YandexWebmasterQuotaExceededError(YandexWebmasterError):
+    """too many requests (429) or daily quota exceeded, only request rate
+    errors are transient"""
+
+    DAILY_QUOTA_CODES = ('QUOTA_EXCEEDED',)
+
+    @property
+    def is_transient(self) -> bool:
+        return self.error_code not in self.DAILY_QUOTA_CODES
+
+
+class YandexWebmasterServerError(YandexWebmasterError):
+    """server error (5xx) or unreadable response body, request can be retried"""
+
+    is_transient = True
+
+
+AUTH_ERROR_CODES = ('INVALID_OAUTH_TOKEN', 'INVALID_USER_ID', 'ACCESS_FORBIDDEN')
+QUOTA_ERROR_CODES = ('QUOTA_EXCEEDED', 'TOO_MANY_REQUESTS_ERROR')
+
+
+def error_class(status_code: int, error_code: Optional[str] = None) -> type:
+    if error_code in QUOTA_ERROR_CODES or status_code == 429:
+        return YandexWebmasterQuotaExceededError
+    if error_code in AUTH_ERROR_CODES or status_code in (401, 403):
+        return YandexWebmasterAuthError
+    if status_code == 404:
+        return YandexWebmasterNotFoundError
+    if status_code >= 500:
+        return YandexWebmasterServerError
+    if status_code >= 400:
+        return YandexWebmasterValidationError
+    return YandexWebmasterError
+
+
+def error_from_response(
+    status_code: int,
+    body: bytes,
+    http_method: Optional[str] = None,
+    endpoint: Optional[str] = None,
+) -> YandexWebmasterError:
+    """build error by http status and error body, body may be not json
+    (e.g. html page of proxy)"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and 'error_code' in data:
+        error_code = data['error_code']
+        error_message = data.get('error_message', '')
+    else:
+        error_code = f'HTTP_{status_code}'
+        error_message = body[:500].decode('utf-8', errors='replace').strip()
+    cls = error_class(status_code, error_code)
+    return cls(
+        error_message,
+        error_code,
+        status_code=status_code,
+        http_method=http_method,
+        endpoint=endpoint,
+    )
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """True if request can be retried: server errors, request rate errors and
+    connection errors"""
+    if isinstance(error, BaseYandexWebmasterError):
+        return error.is_transient
+    return isinstance(error, RequestException)
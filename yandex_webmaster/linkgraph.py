@@ -0,0 +1,268 @@
+import heapq
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .pagination import iter_pages
+
+EXTERNAL = "external"
+BROKEN = "broken"
+
+KINDS = {EXTERNAL: 1, BROKEN: 2}
+BROKEN_INDICATORS = ("SITE_ERROR", "DISALLOWED_BY_USER", "UNSUPPORTED_BY_ROBOT")
+
+
+class Interner(object):
+    """maps strings to sequential int ids, strings are stored once as utf-8 in
+    one buffer and found through open addressing table of int32 ids, without
+    python object per string"""
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array("q", [0])
+        self._hashes = array("q")
+        self._table = array("i", [-1]) * 1024
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, value: str) -> bool:
+        return self.get(value) is not None
+
+    def __getitem__(self, value_id: int) -> str:
+        start, end = self._offsets[value_id], self._offsets[value_id + 1]
+        return self._data[start:end].decode("utf-8")
+
+    def _slot(self, value: bytes, value_hash: int) -> int:
+        """slot of value in table or of first empty slot"""
+        mask = len(self._table) - 1
+        slot = value_hash & mask
+        while True:
+            value_id = self._table[slot]
+            if value_id == -1:
+                return slot
+            if self._hashes[value_id] == value_hash:
+                start, end = self._offsets[value_id], self._offsets[value_id + 1]
+                if self._data[start:end] == value:
+                    return slot
+            slot = (slot + 1) & mask
+
+    def get(self, value: str) -> Optional[int]:
+        encoded = value.encode("utf-8")
+        value_id = self._table[self._slot(encoded, hash(encoded))]
+        return value_id if value_id != -1 else None
+
+    def id(self, value: str) -> int:
+        encoded = value.encode("utf-8")
+        value_hash = hash(encoded)
+        slot = self._slot(encoded, value_hash)
+        value_id = self._table[slot]
+        if value_id != -1:
+            return value_id
+        value_id = len(self._hashes)
+        self._data += encoded
+        self._offsets.append(len(self._data))
+        self._hashes.append(value_hash)
+        self._table[slot] = value_id
+        if 2 * len(self._hashes) > len(self._table):
+            self._grow()
+        return value_id
+
+    def _grow(self) -> None:
+        table = array("i", [-1]) * (2 * len(self._table))
+        mask = len(table) - 1
+        for value_id, value_hash in enumerate(self._hashes):
+            slot = value_hash & mask
+            while table[slot] != -1:
+                slot = (slot + 1) & mask
+            table[slot] = value_id
+        self._table = table
+
+
+class LinkGraph(object):
+    """graph of links (source url -> destination url) with int32 storage
+
+    Urls and source domains are interned (see Interner), edges are kept in
+    int32 arrays and indexed by destination in CSR form (offsets + edge ids),
+    so an edge costs 13 bytes instead of python objects in dicts or sets.
+    Index is rebuilt on first query after links are added.
+
+    Example:
+        graph = LinkGraph()
+        graph.load(client, host_id, BROKEN)
+        graph.load(client, host_id, EXTERNAL)
+        graph.broken_targets(20)
+        graph.top_referring_domains(20)
+        graph.in_degree("https://example.com/page/")
+    """
+
+    def __init__(self):
+        self.urls = Interner()
+        self.domains = Interner()
+        # domain id of each url
+        self._url_domains = array("i")
+        self._sources = array("i")
+        self._destinations = array("i")
+        self._kinds = array("B")
+        self._offsets: Optional[array] = None
+        self._edges: Optional[array] = None
+        self._in_degrees: Dict[int, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def _url_id(self, url: str) -> int:
+        url_id = self.urls.id(url)
+        if url_id == len(self._url_domains):
+            self._url_domains.append(self.domains.id(urlparse(url).hostname or ""))
+        return url_id
+
+    def add(self, source_url: str, destination_url: str, kind: str = EXTERNAL) -> None:
+        self._sources.append(self._url_id(source_url))
+        self._destinations.append(self._url_id(destination_url))
+        self._kinds.append(KINDS[kind])
+        self._offsets = None
+
+    def add_links(self, links: Iterable[dict], kind: str = EXTERNAL) -> int:
+        """add items of "links" list of links samples, return count of added links"""
+        count = 0
+        for link in links:
+            self.add(link["source_url"], link["destination_url"], kind)
+            count += 1
+        return count
+
+    def load(
+        self,
+        client,
+        host_id: str,
+        kind: str,
+        indicators: Iterable[str] = BROKEN_INDICATORS,
+        limit: int = 100,
+    ) -> int:
+        """add all links of get_external_links_samples (EXTERNAL) or
+        get_broken_internal_links_samples (BROKEN)
+
+        Args:
+            client (YandexWebmaster): api client
+            host_id (str): id of host
+            kind (str): EXTERNAL or BROKEN
+            indicators (Iterable[str], optional): indicators of broken links. Defaults to all.
+            limit (int, optional): page size. Defaults to 100.
+
+        Returns:
+            int: count of added links
+        """
+        if kind == EXTERNAL:
+            return self.add_links(
+                iter_pages(
+                    client.get_external_links_samples, "links", limit, host_id=host_id
+                ),
+                kind,
+            )
+        if kind != BROKEN:
+            raise ValueError(f"kind must be one of {tuple(KINDS)}")
+        count = 0
+        for indicator in indicators:
+            count += self.add_links(
+                iter_pages(
+                    client.get_broken_internal_links_samples,
+                    "links",
+                    limit,
+                    host_id=host_id,
+                    indicator=indicator,
+                ),
+                kind,
+            )
+        return count
+
+    def _index(self) -> Tuple[array, array]:
+        """offsets and edge ids sorted by destination (counting sort)"""
+        if self._offsets is not None:
+            return self._offsets, self._edges
+        size = len(self.urls)
+        offsets = array("i", bytes(4 * (size + 1)))
+        for destination in self._destinations:
+            offsets[destination + 1] += 1
+        in_degrees = {code: array("i", bytes(4 * size)) for code in KINDS.values()}
+        for destination, code in zip(self._destinations, self._kinds):
+            in_degrees[code][destination] += 1
+        for i in range(size):
+            offsets[i + 1] += offsets[i]
+        positions = array("i", offsets[:-1])
+        edges = array("i", bytes(4 * len(self._destinations)))
+        for edge, destination in enumerate(self._destinations):
+            edges[positions[destination]] = edge
+            positions[destination] += 1
+        self._offsets, self._edges, self._in_degrees = offsets, edges, in_degrees
+        return offsets, edges
+
+    def _edges_to(self, destination_url: str) -> Iterator[int]:
+        destination = self.urls.get(destination_url)
+        if destination is None:
+            return iter(())
+        offsets, edges = self._index()
+        return iter(edges[offsets[destination] : offsets[destination + 1]])
+
+    def in_degree(self, destination_url: str, kind: Optional[str] = None) -> int:
+        """count of links to url"""
+        destination = self.urls.get(destination_url)
+        if destination is None:
+            return 0
+        offsets, _ = self._index()
+        if kind is None:
+            return offsets[destination + 1] - offsets[destination]
+        return self._in_degrees[KINDS[kind]][destination]
+
+    def sources(self, destination_url: str, kind: Optional[str] = None) -> List[str]:
+        """urls of pages linking to url"""
+        code = KINDS[kind] if kind is not None else None
+        return [
+            self.urls[self._sources[edge]]
+            for edge in self._edges_to(destination_url)
+            if code is None or self._kinds[edge] == code
+        ]
+
+    def top_destinations(
+        self, n: int = 10, kind: Optional[str] = None
+    ) -> List[Tuple[str, int]]:
+        """urls with most links to them"""
+        offsets, _ = self._index()
+        if kind is None:
+            counts: Iterable[int] = (
+                offsets[i + 1] - offsets[i] for i in range(len(self.urls))
+            )
+        else:
+            counts = self._in_degrees[KINDS[kind]]
+        top = heapq.nlargest(
+            n,
+            ((count, i) for i, count in enumerate(counts) if count),
+            key=lambda item: item[0],
+        )
+        return [(self.urls[i], count) for count, i in top]
+
+    def broken_targets(self, n: int = 10) -> List[Tuple[str, int]]:
+        """broken link targets ranked by number of linking pages"""
+        return self.top_destinations(n, BROKEN)
+
+    def top_referring_domains(
+        self,
+        n: int = 10,
+        destination_url: Optional[str] = None,
+        kind: Optional[str] = None,
+    ) -> List[Tuple[str, int]]:
+        """source domains with most links, to destination_url if it is set"""
+        code = KINDS[kind] if kind is not None else None
+        counts = array("i", bytes(4 * len(self.domains)))
+        if destination_url is not None:
+            edges: Iterable[int] = self._edges_to(destination_url)
+        else:
+            edges = range(len(self._sources))
+        for edge in edges:
+            if code is None or self._kinds[edge] == code:
+                counts[self._url_domains[self._sources[edge]]] += 1
+        top = heapq.nlargest(
+            n,
+            ((count, i) for i, count in enumerate(counts) if count),
+            key=lambda item: item[0],
+        )
+        return [(self.domains[i], count) for count, i in top]
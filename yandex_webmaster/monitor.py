@@ -0,0 +1,178 @@
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from requests.exceptions import RequestException
+
+from .errors import BaseYandexWebmasterError
+
+# (field name, path in url info) of tracked fields
+TRACKED_FIELDS = (
+    ("indexing_status", ("indexing_status", "status")),
+    ("http_code", ("indexing_status", "http_code")),
+    ("searchable", ("search_status", "searchable")),
+    ("excluded_url_status", ("search_status", "excluded_url_status")),
+    ("bad_http_status", ("search_status", "bad_http_status")),
+    ("title", ("search_status", "title")),
+    ("description", ("search_status", "description")),
+    ("target_url", ("search_status", "target_url")),
+)
+
+ADDED = "added"
+REMOVED = "removed"
+
+
+@dataclass
+class UrlChange(object):
+    host_id: str
+    url: str
+    field: str
+    old: Any = None
+    new: Any = None
+    history: Optional[List[dict]] = field(default=None, repr=False)
+    # error of get_important_url_history when history was not fetched
+    history_error: Optional[Exception] = field(default=None, repr=False)
+
+    def dict(self) -> dict:
+        return {
+            "host_id": self.host_id,
+            "url": self.url,
+            "field": self.field,
+            "old": self.old,
+            "new": self.new,
+        }
+
+
+def _state(url_info: dict) -> dict:
+    state = {}
+    for name, (section, key) in TRACKED_FIELDS:
+        state[name] = (url_info.get(section) or {}).get(key)
+    return state
+
+
+class ImportantUrlsMonitor(object):
+    """track status changes of important urls across hosts
+
+    Fetches get_monitoring_important_urls of all hosts concurrently, compares
+    tracked fields with last seen snapshot and returns only changes. History of
+    url is fetched only for changed urls. Hosts whose request failed are stored
+    in `errors` and keep their previous snapshot, failed history requests are
+    stored in `history_error` of change.
+
+    Args:
+        client (YandexWebmaster): api client
+        snapshot_path (Optional[str], optional): json file with last seen state, kept in memory if None. Defaults to None.
+        fetch_history (bool, optional): attach get_important_url_history to changes. Defaults to False.
+
+    Example:
+        monitor = ImportantUrlsMonitor(client, "important_urls.json")
+        for change in monitor.check():
+            print(change.host_id, change.url, change.field, change.old, change.new)
+    """
+
+    def __init__(
+        self,
+        client,
+        snapshot_path: Optional[str] = None,
+        fetch_history: bool = False,
+    ):
+        self.client = client
+        self.snapshot_path = snapshot_path
+        self.fetch_history = fetch_history
+        self.snapshot: Dict[str, Dict[str, dict]] = self._load_snapshot()
+        # host_id -> error of last check
+        self.errors: Dict[str, Exception] = {}
+
+    def check(self, host_ids: Optional[List[str]] = None) -> List[UrlChange]:
+        """check important urls and return changes since last check
+
+        First check of host only saves snapshot and returns no changes.
+
+        Args:
+            host_ids (Optional[List[str]], optional): hosts to check, all user hosts if None. Defaults to None.
+
+        Returns:
+            List[UrlChange]: changes
+        """
+        if host_ids is None:
+            host_ids = [host["host_id"] for host in self.client.get_hosts()]
+        responses = self.client._map(
+            lambda host_id: self._call(
+                self.client.get_monitoring_important_urls, host_id
+            ),
+            host_ids,
+        )
+        changes = []
+        errors = {}
+        snapshot = {}
+        for host_id, response in zip(host_ids, responses):
+            if isinstance(response, Exception):
+                errors[host_id] = response
+                continue
+            current = {
+                url_info["url"]: _state(url_info)
+                for url_info in response.get("urls", [])
+            }
+            previous = self.snapshot.get(host_id)
+            if previous is not None:
+                changes.extend(self._diff(host_id, previous, current))
+            snapshot[host_id] = current
+        if self.fetch_history and changes:
+            self._attach_history(changes)
+        # snapshot is updated only when changes are ready to be returned
+        self.snapshot.update(snapshot)
+        self.errors = errors
+        self._save_snapshot()
+        return changes
+
+    @staticmethod
+    def _call(method, *args) -> Union[dict, Exception]:
+        try:
+            return method(*args)
+        except (BaseYandexWebmasterError, RequestException) as e:
+            return e
+
+    def _diff(self, host_id: str, previous: dict, current: dict) -> List[UrlChange]:
+        changes = []
+        for url, state in current.items():
+            old_state = previous.get(url)
+            if old_state is None:
+                changes.append(UrlChange(host_id, url, ADDED, new=state))
+                continue
+            for name, value in state.items():
+                if old_state.get(name) != value:
+                    changes.append(
+                        UrlChange(host_id, url, name, old_state.get(name), value)
+                    )
+        for url, old_state in previous.items():
+            if url not in current:
+                changes.append(UrlChange(host_id, url, REMOVED, old=old_state))
+        return changes
+
+    def _attach_history(self, changes: List[UrlChange]) -> None:
+        keys = sorted({(c.host_id, c.url) for c in changes if c.field != REMOVED})
+        histories = self.client._map(
+            lambda key: self._call(self.client.get_important_url_history, *key), keys
+        )
+        history_by_key = dict(zip(keys, histories))
+        for change in changes:
+            response = history_by_key.get((change.host_id, change.url))
+            if isinstance(response, Exception):
+                change.history_error = response
+            elif response is not None:
+                change.history = response.get("history", [])
+
+    def _load_snapshot(self) -> dict:
+        if self.snapshot_path is None or not os.path.exists(self.snapshot_path):
+            return {}
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_snapshot(self) -> None:
+        if self.snapshot_path is None:
+            return
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
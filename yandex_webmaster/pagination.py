@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import threading
+from typing import Callable, Dict, Iterator, Optional
+
+from .errors import YandexWebmasterValidationError
+
+
+def iter_pages(
+    method: Callable[..., dict],
+    items_key: str,
+    limit: int = 100,
+    offset: int = 0,
+    **kwargs,
+) -> Iterator[dict]:
+    """iterate over all items of limit/offset endpoint
+
+    Args:
+        method (Callable[..., dict]): client method with limit and offset params
+        items_key (str): key of items list in response, e.g. "samples" or "links"
+        limit (int, optional): page size. Defaults to 100.
+        offset (int, optional): start offset. Defaults to 0.
+        **kwargs: other params of method, e.g. host_id
+
+    Example:
+        for sample in iter_pages(client.get_indexing_samples, "samples", host_id=host_id):
+            ...
+    """
+    while True:
+        response = method(limit=limit, offset=offset, **kwargs)
+        items = response.get(items_key) or []
+        yield from items
+        offset += len(items)
+        count = response.get("count")
+        if len(items) < limit or (count is not None and offset >= count):
+            return
+
+
+class AdaptivePaginator(object):
+    """limit/offset iterator which tunes page size per method
+
+        Page size starts from known api maximum of method and never exceeds it.
+        Methods with unknown maximum start from `probe_limit`: when api rejects
+        limit with validation error page size is decreased by binary search
+        between largest accepted and smallest rejected limits and request is
+        repeated. Silently truncated pages are remembered as limit too. After each
+        page size is scaled to keep request time near `target_latency`. Learned
+        limits can be saved to json file and reused by next runs. Methods with
+    `from` cursor instead of offset (get_sitemaps) are paged by cursor.
+
+        Args:
+            state_path (Optional[str], optional): json file with learned limits. Defaults to None.
+            target_latency (float, optional): desired seconds per page. Defaults to 3.0.
+            min_limit (int, optional): smallest page size. Defaults to 10.
+            probe_limit (int, optional): first page size of methods with unknown maximum. Defaults to 1000.
+
+        Example:
+            paginator = AdaptivePaginator("limits.json")
+            for sample in paginator.iterate(client.get_indexing_samples, "samples", host_id=host_id):
+                ...
+    """
+
+    MAX_LIMITS = {
+        "get_popular_search_queries": 500,
+        "get_list_query_analytics": 500,
+        "get_sitemaps": 100,
+        "get_user_added_sitemaps": 100,
+        "get_indexing_samples": 100,
+        "get_insearch_url_samples": 100,
+        "get_insearch_url_events_samples": 100,
+        "get_recrawl_tasks": 100,
+        "get_broken_internal_links_samples": 100,
+        "get_external_links_samples": 100,
+    }
+    # method name -> (cursor param, item id key) of methods paged by `from` cursor
+    CURSOR_PARAMS = {"get_sitemaps": ("from_site_id", "sitemap_id")}
+    LIMIT_ERROR_CODES = ("FIELD_VALIDATION_ERROR", "ENTITY_VALIDATION_ERROR")
+
+    def __init__(
+        self,
+        state_path: Optional[str] = None,
+        target_latency: float = 3.0,
+        min_limit: int = 10,
+        probe_limit: int = 1000,
+    ):
+        self.state_path = state_path
+        self.target_latency = target_latency
+        self.min_limit = min_limit
+        self.probe_limit = probe_limit
+        self._lock = threading.Lock()
+        # method name -> {"accepted": int, "rejected": int, "current": int}
+        self.limits: Dict[str, Dict[str, Optional[int]]] = {}
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.limits = json.load(f)
+
+    def page_size(self, name: str) -> int:
+        with self._lock:
+            return self._cap(name, self._state(name)["current"])
+
+    def iterate(
+        self,
+        method: Callable[..., dict],
+        items_key: str,
+        offset: int = 0,
+        **kwargs,
+    ) -> Iterator[dict]:
+        """iterate over all items of limit/offset method with adaptive page size
+
+        Args:
+            method (Callable[..., dict]): client method with limit and offset params
+            items_key (str): key of items list in response
+            offset (int, optional): start offset, not used by cursor methods. Defaults to 0.
+            **kwargs: other params of method
+        """
+        name = getattr(method, "__name__", repr(method))
+        cursor = self.CURSOR_PARAMS.get(name)
+        if cursor is not None:
+            yield from self._iterate_cursor(method, name, items_key, *cursor, **kwargs)
+            return
+        while True:
+            limit = self.page_size(name)
+            started_at = time.monotonic()
+            try:
+                response = method(limit=limit, offset=offset, **kwargs)
+            except YandexWebmasterValidationError as e:
+                if not self._is_limit_error(e, name, limit):
+                    raise
+                continue
+            items = response.get(items_key) or []
+            count = response.get("count")
+            self._accept(name, limit, len(items), count, offset, started_at)
+            yield from items
+            offset += len(items)
+            if not items:
+                return
+            if count is not None:
+                if offset >= count:
+                    return
+            elif len(items) < limit:
+                return
+
+    def _iterate_cursor(
+        self,
+        method: Callable[..., dict],
+        name: str,
+        items_key: str,
+        cursor_param: str,
+        id_key: str,
+        **kwargs,
+    ) -> Iterator[dict]:
+        """pages of `from` cursor method, cursor item may be repeated on next
+        page (see sitemaps.list_sitemaps)"""
+        seen = set()
+        cursor_id = None
+        while True:
+            limit = self.page_size(name)
+            started_at = time.monotonic()
+            try:
+                response = method(limit=limit, **{cursor_param: cursor_id}, **kwargs)
+            except YandexWebmasterValidationError as e:
+                if not self._is_limit_error(e, name, limit):
+                    raise
+                continue
+            items = response.get(items_key) or []
+            self._accept(name, limit, len(items), None, len(seen), started_at)
+            new = [item for item in items if item[id_key] not in seen]
+            yield from new
+            seen.update(item[id_key] for item in new)
+            if not new or len(items) < limit:
+                return
+            cursor_id = items[-1][id_key]
+
+    def _is_limit_error(
+        self, error: YandexWebmasterValidationError, name: str, limit: int
+    ) -> bool:
+        """True if error rejects limit and page should be repeated with smaller one"""
+        return error.error_code in self.LIMIT_ERROR_CODES and self._reject(name, limit)
+
+    def save(self) -> None:
+        if self.state_path is None:
+            return
+        with self._lock:
+            data = json.dumps(self.limits)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.state_path)
+
+    def _state(self, name: str) -> Dict[str, Optional[int]]:
+        state = self.limits.get(name)
+        if state is None:
+            state = self.limits[name] = {
+                "accepted": None,
+                "rejected": None,
+                "current": self.MAX_LIMITS.get(name, self.probe_limit),
+            }
+        return state
+
+    def _cap(self, name: str, limit: int) -> int:
+        """known api maximum is not probed"""
+        maximum = self.MAX_LIMITS.get(name)
+        return min(limit, maximum) if maximum is not None else limit
+
+    def _reject(self, name: str, limit: int) -> bool:
+        """remember rejected limit, returns False if page size can't be decreased"""
+        with self._lock:
+            state = self._state(name)
+            if limit <= self.min_limit:
+                return False
+            if state["rejected"] is None or limit < state["rejected"]:
+                state["rejected"] = limit
+            accepted = state["accepted"] or 0
+            if accepted >= limit:
+                # limit was accepted before, error is not about limit
+                return False
+            state["current"] = max(self.min_limit, (accepted + limit) // 2)
+            if accepted and state["current"] <= accepted:
+                state["current"] = accepted
+        self.save()
+        return True
+
+    def _accept(
+        self,
+        name: str,
+        limit: int,
+        size: int,
+        count: Optional[int],
+        offset: int,
+        started_at: float,
+    ) -> None:
+        elapsed = time.monotonic() - started_at
+        with self._lock:
+            state = self._state(name)
+            changed = False
+            if count is not None and size < limit and offset + size < count:
+                # api truncated page silently, size is max limit
+                state["rejected"] = size + 1
+                limit = size
+                changed = True
+            if state["accepted"] is None or limit > state["accepted"]:
+                state["accepted"] = limit
+                changed = True
+            current = limit
+            if elapsed > self.target_latency:
+                current = int(limit * self.target_latency / elapsed)
+            elif elapsed < self.target_latency / 2:
+                current = limit * 2
+            if state["rejected"] is not None:
+                current = min(current, state["rejected"] - 1)
+            state["current"] = self._cap(name, max(self.min_limit, current))
+        if changed:
+            self.save()
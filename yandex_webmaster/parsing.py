@@ -0,0 +1,190 @@
+import os
+import json
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+def query_analytics_rows(response: dict) -> List[dict]:
+    """flatten get_list_query_analytics response to one row per text and date
+
+    Returns:
+        List[dict]: [{
+            "type": "URL",
+            "text": "some text",
+            "date": "2023-04-15",
+            "CLICKS": 7.0,
+            "IMPRESSIONS": 8595.0,
+            ...
+        }, ...]
+    """
+    rows = []
+    for item in response.get("text_indicator_to_statistics") or []:
+        indicator = item.get("text_indicator") or {}
+        by_date: dict = {}
+        for statistic in item.get("statistics") or []:
+            row = by_date.get(statistic["date"])
+            if row is None:
+                row = by_date[statistic["date"]] = {
+                    "type": indicator.get("type"),
+                    "text": indicator.get("value"),
+                    "date": statistic["date"],
+                }
+            row[statistic["field"]] = statistic["value"]
+        rows.extend(by_date.values())
+    return rows
+
+
+def links_rows(response: dict) -> List[dict]:
+    """flatten links response (external or broken internal links samples) with
+    parsed source domain and destination path"""
+    rows = []
+    for link in response.get("links") or []:
+        source = urlparse(link.get("source_url") or "")
+        destination = urlparse(link.get("destination_url") or "")
+        rows.append(
+            {
+                "source_url": link.get("source_url"),
+                "source_domain": source.hostname,
+                "destination_url": link.get("destination_url"),
+                "destination_path": destination.path,
+                "discovery_date": link.get("discovery_date"),
+                "source_last_access_date": link.get("source_last_access_date"),
+            }
+        )
+    return rows
+
+
+def _parse_page(
+    parser: Callable[[dict], List[dict]], body: bytes
+) -> Tuple[Optional[int], List[dict]]:
+    response = json.loads(body)
+    return response.get("count"), parser(response)
+
+
+class ParsingPipeline(object):
+    """decode and flatten raw response bodies in process pool
+
+    Pages are fetched as bytes in client thread pool and parsed in worker
+    processes, results are yielded in order of pages. Count of pages in flight
+    is bounded, so memory does not grow with count of pages.
+
+    Args:
+        processes (Optional[int], optional): worker processes, cpu count if None. Defaults to None.
+        max_pending (Optional[int], optional): max pages in flight. Defaults to 2 * processes.
+
+    Example:
+        with ParsingPipeline() as pipeline:
+            for row in pipeline.iter_query_analytics_rows(client, host_id):
+                ...
+    """
+
+    def __init__(
+        self, processes: Optional[int] = None, max_pending: Optional[int] = None
+    ):
+        processes = processes or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=processes)
+        self.max_pending = max_pending or 2 * processes
+
+    def __enter__(self) -> "ParsingPipeline":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def map(
+        self, parser: Callable[[dict], List[dict]], bodies: Iterable[bytes]
+    ) -> Iterator[List[dict]]:
+        """parse raw bodies in worker processes, parser must be module level function
+
+        Yields:
+            List[dict]: rows of each body, in order of bodies
+        """
+        pending: Deque[Future] = deque()
+        for body in bodies:
+            pending.append(self._executor.submit(_parse_page, parser, body))
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().result()[1]
+        while pending:
+            yield pending.popleft().result()[1]
+
+    def iter_pages(
+        self,
+        client,
+        fetch: Callable[[int, int], bytes],
+        parser: Callable[[dict], List[dict]],
+        limit: int,
+    ) -> Iterator[dict]:
+        """fetch limit/offset pages concurrently and yield parsed rows in order
+
+        Args:
+            client (YandexWebmaster): api client, pages are fetched in its thread pool
+            fetch (Callable[[int, int], bytes]): returns raw page by limit and offset
+            parser (Callable[[dict], List[dict]]): module level function building rows from response
+            limit (int): page size
+        """
+        count, rows = self._executor.submit(
+            _parse_page, parser, fetch(limit, 0)
+        ).result()
+        yield from rows
+        if count is None or count <= limit:
+            return
+        bodies = self._fetch(client, fetch, limit, range(limit, count, limit))
+        for rows in self.map(parser, bodies):
+            yield from rows
+
+    def _fetch(
+        self,
+        client,
+        fetch: Callable[[int, int], bytes],
+        limit: int,
+        offsets: Iterable[int],
+    ) -> Iterator[bytes]:
+        pending: Deque[Future] = deque()
+        for offset in offsets:
+            pending.append(client.submit(fetch, limit, offset))
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def iter_query_analytics_rows(
+        self, client, host_id: str, limit: int = 500, **kwargs
+    ) -> Iterator[dict]:
+        """all rows of get_list_query_analytics (see query_analytics_rows)
+
+        Args:
+            client (YandexWebmaster): api client
+            host_id (str): id of host
+            limit (int, optional): page size. Defaults to 500.
+            **kwargs: other params of get_list_query_analytics
+        """
+
+        def fetch(limit: int, offset: int) -> bytes:
+            return client.get_list_query_analytics(
+                host_id, limit=limit, offset=offset, raw=True, **kwargs
+            )
+
+        return self.iter_pages(client, fetch, query_analytics_rows, limit)
+
+    def iter_external_links_rows(
+        self, client, host_id: str, limit: int = 100
+    ) -> Iterator[dict]:
+        """all rows of get_external_links_samples (see links_rows)
+
+        Args:
+            client (YandexWebmaster): api client
+            host_id (str): id of host
+            limit (int, optional): page size. Defaults to 100.
+        """
+
+        def fetch(limit: int, offset: int) -> bytes:
+            return client.get_external_links_samples(
+                host_id, limit=limit, offset=offset, raw=True
+            )
+
+        return self.iter_pages(client, fetch, links_rows, limit)
@@ -0,0 +1,331 @@
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .archive import split_endpoint
+
+# order of request phases on timeline
+PHASES = ("rate_limit_wait", "connect", "tls", "server_wait", "download", "decode")
+
+_local = threading.local()
+
+
+@dataclass
+class CallRecord(object):
+    name: str
+    http_method: str
+    endpoint: str
+    thread_id: int
+    start: float
+    end: Optional[float] = None
+    status_code: Optional[int] = None
+    # phase -> (start, duration) in seconds of perf_counter
+    phases: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    allocated_blocks: Optional[int] = None
+    allocated_bytes: Optional[int] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def add_phase(self, name: str, start: float, end: float) -> None:
+        if name in self.phases:
+            # e.g. several connects after retries
+            first, duration = self.phases[name]
+            self.phases[name] = (first, duration + end - start)
+        else:
+            self.phases[name] = (start, end - start)
+
+    def dict(self) -> dict:
+        return {
+            "name": self.name,
+            "http_method": self.http_method,
+            "endpoint": self.endpoint,
+            "thread_id": self.thread_id,
+            "duration": self.duration,
+            "status_code": self.status_code,
+            "phases": {name: value[1] for name, value in self.phases.items()},
+            "allocated_blocks": self.allocated_blocks,
+            "allocated_bytes": self.allocated_bytes,
+        }
+
+
+@dataclass
+class Span(object):
+    name: str
+    thread_id: int
+    start: float
+    end: float
+
+
+def current_record() -> Optional[CallRecord]:
+    return getattr(_local, "record", None)
+
+
+class TimedConnectionMixin(object):
+    """reports dns and tcp connect time of urllib3 connection"""
+
+    def _new_conn(self, *args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return super()._new_conn(*args, **kwargs)
+        finally:
+            record = current_record()
+            if record is not None:
+                _local.connected_at = time.perf_counter()
+                record.add_phase("connect", started_at, _local.connected_at)
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self, *args, **kwargs):
+        _local.connected_at = None
+        try:
+            return super().connect(*args, **kwargs)
+        finally:
+            record = current_record()
+            connected_at = getattr(_local, "connected_at", None)
+            if record is not None and connected_at is not None:
+                # handshake after tcp connection
+                record.add_phase("tls", connected_at, time.perf_counter())
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class ProfilingHTTPAdapter(HTTPAdapter):
+    """http adapter whose connections report connect and tls time"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+class Profiler(object):
+    """per call timing of request phases and allocations of json decoding
+
+    Phases: rate_limit_wait, connect (dns and tcp), tls, server_wait (request
+    sent until headers received), download (body), decode (json). Allocations
+    of decoding are count of new memory blocks and bytes kept by decoded
+    response, counters are process wide, so calls decoded at the same time in
+    other threads are counted too. Tracing of allocations started by profiler
+    is stopped by stop() (client.disable_profiling()).
+
+    Args:
+        trace_allocations (bool, optional): count allocations of decoding with tracemalloc. Defaults to True.
+
+    Example:
+        profiler = client.enable_profiling()
+        ...
+        with profiler.span("build rows"):
+            ...
+        profiler.export_chrome_trace("trace.json")  # open in ui.perfetto.dev
+    """
+
+    def __init__(self, trace_allocations: bool = True):
+        self.trace_allocations = trace_allocations
+        self.started_at = time.perf_counter()
+        self.records: List[CallRecord] = []
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """stop tracemalloc if it was started by this profiler, records are kept"""
+        self.trace_allocations = False
+        if self._started_tracing:
+            self._started_tracing = False
+            tracemalloc.stop()
+
+    @contextmanager
+    def call(self, http_method: str, endpoint: str) -> Iterator[CallRecord]:
+        """record api call, name of record is endpoint route without user and host"""
+        route = split_endpoint(endpoint)[1] or "host"
+        record = CallRecord(
+            route, http_method, endpoint, threading.get_ident(), time.perf_counter()
+        )
+        previous = current_record()
+        _local.record = record
+        try:
+            yield record
+        finally:
+            record.end = time.perf_counter()
+            _local.record = previous
+            with self._lock:
+                self.records.append(record)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        record = current_record()
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            if record is not None:
+                record.add_phase(name, started_at, time.perf_counter())
+
+    @contextmanager
+    def decode(self) -> Iterator[None]:
+        record = current_record()
+        if record is None or not self.trace_allocations:
+            with self.phase("decode"):
+                yield
+            return
+        blocks = sys.getallocatedblocks()
+        traced, _ = tracemalloc.get_traced_memory()
+        with self.phase("decode"):
+            yield
+        record.allocated_blocks = sys.getallocatedblocks() - blocks
+        record.allocated_bytes = tracemalloc.get_traced_memory()[0] - traced
+
+    def download(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """chunks of streamed body, only reading of chunks is timed as download,
+        not processing of items between them"""
+        record = current_record()
+        chunks = iter(chunks)
+        while True:
+            started_at = time.perf_counter()
+            chunk = next(chunks, None)
+            if record is not None:
+                record.add_phase("download", started_at, time.perf_counter())
+            if chunk is None:
+                return
+            yield chunk
+
+    def add_response(
+        self, response: Response, request_started_at: float, stream: bool
+    ) -> None:
+        """split time of session request to server wait and body download"""
+        record = current_record()
+        if record is None:
+            return
+        now = time.perf_counter()
+        record.status_code = response.status_code
+        headers_at = request_started_at + response.elapsed.total_seconds()
+        connected_at = request_started_at
+        for name in ("connect", "tls"):
+            if name in record.phases:
+                start, duration = record.phases[name]
+                connected_at = max(connected_at, start + duration)
+        record.add_phase("server_wait", connected_at, max(connected_at, headers_at))
+        if not stream:
+            record.add_phase("download", min(headers_at, now), now)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """time of own processing, shown on trace timeline"""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.spans.append(
+                    Span(name, threading.get_ident(), started_at, time.perf_counter())
+                )
+
+    def summary(self) -> Dict[str, dict]:
+        """total and average seconds of each phase by call name"""
+        result: Dict[str, dict] = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            item = result.setdefault(
+                record.name, {"calls": 0, "duration": 0.0, "phases": {}}
+            )
+            item["calls"] += 1
+            item["duration"] += record.duration
+            for name, (_, duration) in record.phases.items():
+                item["phases"][name] = item["phases"].get(name, 0.0) + duration
+        for item in result.values():
+            item["avg_duration"] = item["duration"] / item["calls"]
+        return result
+
+    def chrome_trace(self) -> dict:
+        """trace in chrome trace event format (chrome://tracing, ui.perfetto.dev)"""
+
+        def us(value: float) -> float:
+            return round((value - self.started_at) * 1e6, 3)
+
+        events = []
+        with self._lock:
+            records = list(self.records)
+            spans = list(self.spans)
+        for thread_id in {r.thread_id for r in records} | {s.thread_id for s in spans}:
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 0,
+                    "tid": thread_id,
+                    "args": {"name": f"thread {thread_id}"},
+                }
+            )
+        for record in records:
+            events.append(
+                {
+                    "name": record.name,
+                    "cat": "call",
+                    "ph": "X",
+                    "pid": 0,
+                    "tid": record.thread_id,
+                    "ts": us(record.start),
+                    "dur": round(record.duration * 1e6, 3),
+                    "args": record.dict(),
+                }
+            )
+            for name in PHASES:
+                if name not in record.phases:
+                    continue
+                start, duration = record.phases[name]
+                events.append(
+                    {
+                        "name": name,
+                        "cat": "phase",
+                        "ph": "X",
+                        "pid": 0,
+                        "tid": record.thread_id,
+                        "ts": us(start),
+                        "dur": round(duration * 1e6, 3),
+                    }
+                )
+        for span in spans:
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": "span",
+                    "ph": "X",
+                    "pid": 0,
+                    "tid": span.thread_id,
+                    "ts": us(span.start),
+                    "dur": round((span.end - span.start) * 1e6, 3),
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from requests.exceptions import RequestException
+
+from .errors import BaseYandexWebmasterError
+
+ADD_HOST = "add_host"
+DELETE_HOST = "delete_host"
+ADD_SITEMAP = "add_sitemap"
+DELETE_SITEMAP = "delete_sitemap"
+
+
+@dataclass
+class ProvisionResult(object):
+    action: str
+    target: str
+    host_id: Optional[str] = None
+    response: Optional[dict] = None
+    error: Optional[Exception] = None
+    dry_run: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def dict(self) -> dict:
+        return {
+            "action": self.action,
+            "target": self.target,
+            "host_id": self.host_id,
+            "ok": self.ok,
+            "response": self.response,
+            "error": str(self.error) if self.error is not None else None,
+            "dry_run": self.dry_run,
+        }
+
+
+def normalize_url(url: str) -> str:
+    """lowercase scheme and host, path and query are case-sensitive"""
+    parts = urlsplit(url.strip().rstrip("/"))
+    return urlunsplit(
+        parts._replace(scheme=parts.scheme.lower(), netloc=parts.netloc.lower())
+    )
+
+
+def _host_urls(host: dict) -> List[str]:
+    urls = [host.get("ascii_host_url"), host.get("unicode_host_url")]
+    return [normalize_url(url) for url in urls if url]
+
+
+def _apply(
+    client, actions: List[Tuple[str, str, Optional[str], tuple]], dry_run: bool
+) -> List[ProvisionResult]:
+    def run(action: Tuple[str, str, Optional[str], tuple]) -> ProvisionResult:
+        name, target, host_id, args = action
+        result = ProvisionResult(name, target, host_id, dry_run=dry_run)
+        if dry_run:
+            return result
+        try:
+            result.response = getattr(client, name)(*args)
+        except (BaseYandexWebmasterError, RequestException) as e:
+            result.error = e
+        if name == ADD_HOST and result.response:
+            result.host_id = result.response.get("host_id")
+        return result
+
+    return client._map(run, actions)
+
+
+def provision_hosts(
+    client,
+    host_urls: Iterable[str],
+    delete_missing: bool = False,
+    dry_run: bool = False,
+) -> List[ProvisionResult]:
+    """add hosts missing in webmaster and optionally delete hosts missing in host_urls,
+    requests run concurrently in client thread pool
+
+    Args:
+        client (YandexWebmaster): api client
+        host_urls (Iterable[str]): desired host urls, e.g. "https://example.com"
+        delete_missing (bool, optional): delete hosts which are not in host_urls. Defaults to False.
+        dry_run (bool, optional): only return planned actions. Defaults to False.
+
+    Returns:
+        List[ProvisionResult]: result of each add or delete
+    """
+    desired = {normalize_url(url): url for url in host_urls}
+    hosts = client.get_hosts()
+    existing = set()
+    actions = []
+    for host in hosts:
+        urls = _host_urls(host)
+        existing.update(urls)
+        if delete_missing and not any(url in desired for url in urls):
+            target = host.get("unicode_host_url") or host["host_id"]
+            actions.append((DELETE_HOST, target, host["host_id"], (host["host_id"],)))
+    for key, url in desired.items():
+        if key not in existing:
+            actions.append((ADD_HOST, url, None, (url,)))
+    return _apply(client, actions, dry_run)
+
+
+def get_all_user_added_sitemaps(client, host_id: str, limit: int = 100) -> List[dict]:
+    sitemaps: List[dict] = []
+    while True:
+        response = client.get_user_added_sitemaps(
+            host_id, limit=limit, offset=str(len(sitemaps)) if sitemaps else None
+        )
+        page = response.get("sitemaps") or []
+        sitemaps.extend(page)
+        count = response.get("count")
+        if len(page) < limit or (count is not None and len(sitemaps) >= count):
+            return sitemaps
+
+
+def provision_sitemaps(
+    client,
+    sitemaps: Dict[str, Iterable[str]],
+    delete_missing: bool = False,
+    dry_run: bool = False,
+) -> List[ProvisionResult]:
+    """add sitemaps missing in user added sitemaps of hosts and optionally delete
+    sitemaps missing in desired state, requests run concurrently in client thread pool
+
+    Args:
+        client (YandexWebmaster): api client
+        sitemaps (Dict[str, Iterable[str]]): host_id -> desired sitemap urls
+        delete_missing (bool, optional): delete user added sitemaps which are not desired. Defaults to False.
+        dry_run (bool, optional): only return planned actions. Defaults to False.
+
+    Returns:
+        List[ProvisionResult]: result of each add or delete
+    """
+    host_ids = list(sitemaps)
+    current = client._map(
+        lambda host_id: get_all_user_added_sitemaps(client, host_id), host_ids
+    )
+    actions = []
+    for host_id, added in zip(host_ids, current):
+        desired = {normalize_url(url): url for url in sitemaps[host_id]}
+        existing = set()
+        for sitemap in added:
+            key = normalize_url(sitemap["sitemap_url"])
+            existing.add(key)
+            if delete_missing and key not in desired:
+                actions.append(
+                    (
+                        DELETE_SITEMAP,
+                        sitemap["sitemap_url"],
+                        host_id,
+                        (host_id, sitemap["sitemap_id"]),
+                    )
+                )
+        for key, url in desired.items():
+            if key not in existing:
+                actions.append((ADD_SITEMAP, url, host_id, (host_id, url)))
+    return _apply(client, actions, dry_run)
+
+
+def provision(
+    client,
+    state: Dict[str, Iterable[str]],
+    delete_missing: bool = False,
+    dry_run: bool = False,
+) -> List[ProvisionResult]:
+    """apply desired state of hosts and their sitemaps (see provision_hosts and
+    provision_sitemaps)
+
+    Args:
+        client (YandexWebmaster): api client
+        state (Dict[str, Iterable[str]]): host url -> sitemap urls
+        delete_missing (bool, optional): delete hosts and sitemaps which are not in state. Defaults to False.
+        dry_run (bool, optional): only return planned actions. Defaults to False.
+
+    Returns:
+        List[ProvisionResult]: result of each add or delete
+
+    Example:
+        results = provision(client, {
+            "https://example.com": ["https://example.com/sitemap.xml"],
+        })
+        failed = [r for r in results if not r.ok]
+    """
+    results = provision_hosts(client, state, delete_missing, dry_run)
+    host_ids = {}
+    for host in client.get_hosts():
+        for url in _host_urls(host):
+            host_ids[url] = host["host_id"]
+    for result in results:
+        if result.action == ADD_HOST and result.host_id:
+            host_ids[normalize_url(result.target)] = result.host_id
+    sitemaps = {}
+    for host_url, sitemap_urls in state.items():
+        host_id = host_ids.get(normalize_url(host_url))
+        # host is not added yet in dry run or its adding failed
+        if host_id is not None:
+            sitemaps[host_id] = list(sitemap_urls)
+    return results + provision_sitemaps(client, sitemaps, delete_missing, dry_run)
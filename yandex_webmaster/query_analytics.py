@@ -0,0 +1,274 @@
+import os
+import copy
+import json
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Union
+
+from .pagination import iter_pages
+from .parsing import query_analytics_rows
+
+TEXT_INDICATORS = ("URL", "QUERY")
+DEVICE_TYPE_INDICATORS = ("ALL", "DESKTOP", "MOBILE_AND_TABLET", "MOBILE", "TABLET")
+STATISTIC_FIELDS = ("IMPRESSIONS", "CLICKS", "CTR", "POSITION", "DEMAND")
+OPERATIONS = {
+    ">": "GREATER_THAN",
+    ">=": "GREATER_EQUAL",
+    "<": "LESS_THAN",
+    "<=": "LESS_EQUAL",
+    "=": "EQUALS",
+}
+
+DateLike = Union[date, datetime, str]
+
+
+def _date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value[:10], "%Y-%m-%d").date()
+
+
+class QueryAnalyticsQuery(object):
+    """builder of get_list_query_analytics params, filters are applied by api
+    before data is sent
+
+    Args:
+        text_indicator (str, optional): URL or QUERY. Defaults to "URL".
+        device_type_indicator (str, optional): device type. Defaults to "ALL".
+
+    Example:
+        query = (
+            QueryAnalyticsQuery("URL")
+            .text_contains("/catalog/")
+            .where("IMPRESSIONS", ">", 100)
+            .date_range(date_from, date_to)
+            .regions(213)
+        )
+        response = client.get_list_query_analytics(host_id, **query.build())
+    """
+
+    def __init__(self, text_indicator: str = "URL", device_type_indicator: str = "ALL"):
+        if text_indicator not in TEXT_INDICATORS:
+            raise ValueError(f"text_indicator must be one of {TEXT_INDICATORS}")
+        if device_type_indicator not in DEVICE_TYPE_INDICATORS:
+            raise ValueError(
+                f"device_type_indicator must be one of {DEVICE_TYPE_INDICATORS}"
+            )
+        self.text_indicator = text_indicator
+        self.device_type_indicator = device_type_indicator
+        self.text_filters: List[dict] = []
+        self.statistic_filters: List[dict] = []
+        self.region_ids: List[int] = []
+        self.sort_by_date: Optional[dict] = None
+        self.date_from: Optional[date] = None
+        self.date_to: Optional[date] = None
+
+    def copy(self) -> "QueryAnalyticsQuery":
+        return copy.deepcopy(self)
+
+    def text_contains(self, value: str) -> "QueryAnalyticsQuery":
+        return self._text_filter("TEXT_CONTAINS", value)
+
+    def text_not_contains(self, value: str) -> "QueryAnalyticsQuery":
+        return self._text_filter("TEXT_DOES_NOT_CONTAIN", value)
+
+    def text_match(self, value: str) -> "QueryAnalyticsQuery":
+        return self._text_filter("TEXT_MATCH", value)
+
+    def where(
+        self,
+        field: str,
+        operation: str,
+        value: float,
+        date_from: Optional[DateLike] = None,
+        date_to: Optional[DateLike] = None,
+    ) -> "QueryAnalyticsQuery":
+        """add statistic filter, e.g. where("IMPRESSIONS", ">", 100)
+
+        Args:
+            field (str): IMPRESSIONS, CLICKS, CTR, POSITION or DEMAND
+            operation (str): one of >, >=, <, <=, =
+            value (float): value
+            date_from (Optional[DateLike], optional): period of statistic, date_range of query if None. Defaults to None.
+            date_to (Optional[DateLike], optional): period of statistic, date_range of query if None. Defaults to None.
+        """
+        if field not in STATISTIC_FIELDS:
+            raise ValueError(f"field must be one of {STATISTIC_FIELDS}")
+        if operation not in OPERATIONS:
+            raise ValueError(f"operation must be one of {tuple(OPERATIONS)}")
+        statistic_filter = {
+            "statistic_field": field,
+            "operation": OPERATIONS[operation],
+            "value": value,
+        }
+        if date_from is not None:
+            statistic_filter["from"] = _date(date_from).isoformat()
+        if date_to is not None:
+            statistic_filter["to"] = _date(date_to).isoformat()
+        self.statistic_filters.append(statistic_filter)
+        return self
+
+    def date_range(
+        self, date_from: DateLike, date_to: DateLike
+    ) -> "QueryAnalyticsQuery":
+        """default period of statistic filters"""
+        self.date_from = _date(date_from)
+        self.date_to = _date(date_to)
+        if self.date_from > self.date_to:
+            raise ValueError("date_from must not be after date_to")
+        return self
+
+    def regions(self, *region_ids: int) -> "QueryAnalyticsQuery":
+        self.region_ids.extend(region_ids)
+        return self
+
+    def sort_by(
+        self, field: str, on_date: DateLike, descending: bool = True
+    ) -> "QueryAnalyticsQuery":
+        if field not in STATISTIC_FIELDS:
+            raise ValueError(f"field must be one of {STATISTIC_FIELDS}")
+        self.sort_by_date = {
+            "date": _date(on_date).isoformat(),
+            "statistic_field": field,
+            "by": "DESC" if descending else "ASC",
+        }
+        return self
+
+    def build(self) -> dict:
+        """kwargs of get_list_query_analytics"""
+        params: dict = {
+            "text_indicator": self.text_indicator,
+            "device_type_indicator": self.device_type_indicator,
+        }
+        filters = {}
+        if self.text_filters:
+            filters["text_filters"] = list(self.text_filters)
+        statistic_filters = []
+        for statistic_filter in self.statistic_filters:
+            statistic_filter = dict(statistic_filter)
+            if self.date_from is not None:
+                statistic_filter.setdefault("from", self.date_from.isoformat())
+            if self.date_to is not None:
+                statistic_filter.setdefault("to", self.date_to.isoformat())
+            statistic_filters.append(statistic_filter)
+        if statistic_filters:
+            filters["statistic_filters"] = statistic_filters
+        if filters:
+            params["filters"] = filters
+        if self.region_ids:
+            params["region_ids"] = list(self.region_ids)
+        if self.sort_by_date is not None:
+            params["sort_by_date"] = dict(self.sort_by_date)
+        return params
+
+    def key(self) -> str:
+        """stable key of query without date range"""
+        query = self.copy()
+        query.date_from = query.date_to = None
+        data = json.dumps(query.build(), sort_keys=True)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+    def iterate(self, client, host_id: str, limit: int = 500) -> Iterator[dict]:
+        """iterate all text_indicator_to_statistics items of query"""
+        return iter_pages(
+            client.get_list_query_analytics,
+            "text_indicator_to_statistics",
+            limit,
+            host_id=host_id,
+            **self.build(),
+        )
+
+    def _text_filter(self, operation: str, value: str) -> "QueryAnalyticsQuery":
+        self.text_filters.append(
+            {
+                "text_indicator": self.text_indicator,
+                "operation": operation,
+                "value": value,
+            }
+        )
+        return self
+
+
+class IncrementalQueryAnalytics(object):
+    """sync query analytics incrementally, only days after last synced day are
+    requested
+
+    Days not synced yet are requested at once with statistic filters limited
+    to these days (query without statistic filters gets IMPRESSIONS > 0), every
+    item is split to rows by date and rows of other dates are dropped. Last
+    synced day of each host and query is saved to `state_path` when all rows
+    are yielded.
+
+    Args:
+        client (YandexWebmaster): api client
+        state_path (Optional[str], optional): json file with last synced days. Defaults to None.
+
+    Example:
+        sync = IncrementalQueryAnalytics(client, "query_analytics_state.json")
+        for row in sync.sync(host_id, QueryAnalyticsQuery("QUERY"), date_from):
+            save(row)
+    """
+
+    def __init__(self, client, state_path: Optional[str] = None):
+        self.client = client
+        self.state_path = state_path
+        self.state: Dict[str, str] = {}
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def last_synced(self, host_id: str, query: QueryAnalyticsQuery) -> Optional[date]:
+        value = self.state.get(self._key(host_id, query))
+        return _date(value) if value else None
+
+    def sync(
+        self,
+        host_id: str,
+        query: QueryAnalyticsQuery,
+        date_from: DateLike,
+        date_to: Optional[DateLike] = None,
+        limit: int = 500,
+    ) -> Iterator[dict]:
+        """yield rows (see parsing.query_analytics_rows) of days not synced yet
+
+        Args:
+            host_id (str): id of host
+            query (QueryAnalyticsQuery): query
+            date_from (DateLike): first day
+            date_to (Optional[DateLike], optional): last day, yesterday if None. Defaults to None.
+            limit (int, optional): page size. Defaults to 500.
+        """
+        first_day = _date(date_from)
+        last_synced = self.last_synced(host_id, query)
+        if last_synced is not None and last_synced >= first_day:
+            first_day = last_synced + timedelta(days=1)
+        last_day = (
+            _date(date_to) if date_to is not None else date.today() - timedelta(1)
+        )
+        if first_day > last_day:
+            return
+        first_value, last_value = first_day.isoformat(), last_day.isoformat()
+        range_query = query.copy().date_range(first_day, last_day)
+        if not range_query.statistic_filters:
+            range_query.where("IMPRESSIONS", ">", 0)
+        for statistic_filter in range_query.statistic_filters:
+            statistic_filter.update({"from": first_value, "to": last_value})
+        for item in range_query.iterate(self.client, host_id, limit):
+            for row in query_analytics_rows({"text_indicator_to_statistics": [item]}):
+                if first_value <= row["date"][:10] <= last_value:
+                    yield row
+        self.state[self._key(host_id, query)] = last_value
+        self._save()
+
+    def _key(self, host_id: str, query: QueryAnalyticsQuery) -> str:
+        return f"{host_id}:{query.key()}"
+
+    def _save(self) -> None:
+        if self.state_path is None:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
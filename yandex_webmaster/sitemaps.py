@@ -0,0 +1,144 @@
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Union
+
+from requests.exceptions import RequestException
+
+from .errors import BaseYandexWebmasterError, is_transient_error
+
+
+@dataclass
+class SitemapNode(object):
+    sitemap_id: str
+    sitemap_url: str
+    sitemap_type: Optional[str] = None
+    urls_count: int = 0
+    errors_count: int = 0
+    children_count: int = 0
+    children: List["SitemapNode"] = field(default_factory=list)
+    error: Optional[Union[BaseYandexWebmasterError, RequestException]] = None
+
+    @classmethod
+    def from_response(cls, sitemap: dict) -> "SitemapNode":
+        return cls(
+            sitemap_id=sitemap["sitemap_id"],
+            sitemap_url=sitemap.get("sitemap_url"),
+            sitemap_type=sitemap.get("sitemap_type"),
+            urls_count=sitemap.get("urls_count") or 0,
+            errors_count=sitemap.get("errors_count") or 0,
+            children_count=sitemap.get("children_count") or 0,
+        )
+
+    @property
+    def total_urls_count(self) -> int:
+        return self.urls_count + sum(c.total_urls_count for c in self.children)
+
+    @property
+    def total_errors_count(self) -> int:
+        return self.errors_count + sum(c.total_errors_count for c in self.children)
+
+    def dict(self) -> dict:
+        return {
+            "sitemap_id": self.sitemap_id,
+            "sitemap_url": self.sitemap_url,
+            "sitemap_type": self.sitemap_type,
+            "urls_count": self.urls_count,
+            "errors_count": self.errors_count,
+            "error": self._error_dict(),
+            "children": [child.dict() for child in self.children],
+        }
+
+    def _error_dict(self) -> Optional[dict]:
+        if self.error is None:
+            return None
+        if isinstance(self.error, BaseYandexWebmasterError):
+            return self.error.dict()
+        # connection error or timeout
+        return {
+            "error_message": str(self.error),
+            "error_code": type(self.error).__name__,
+            "is_transient": is_transient_error(self.error),
+        }
+
+
+def iter_nodes(nodes: List[SitemapNode]) -> Iterator[SitemapNode]:
+    """iterate over all nodes of tree, depth first"""
+    for node in nodes:
+        yield node
+        yield from iter_nodes(node.children)
+
+
+def list_sitemaps(
+    client, host_id: str, parent_id: Optional[str] = None, limit: int = 100
+) -> List[dict]:
+    """get all sitemaps of one level, pages are requested with `from` cursor
+
+    Args:
+        client (YandexWebmaster): api client
+        host_id (str): id of host
+        parent_id (Optional[str], optional): parent sitemap_id. Defaults to None.
+        limit (int, optional): page size. Defaults to 100.
+
+    Returns:
+        List[dict]: sitemaps as returned by get_sitemaps
+    """
+    sitemaps: List[dict] = []
+    seen = set()
+    from_site_id = None
+    while True:
+        response = client.get_sitemaps(
+            host_id, parent_id=parent_id, limit=limit, from_site_id=from_site_id
+        )
+        page = response.get("sitemaps") or []
+        new = [s for s in page if s["sitemap_id"] not in seen]
+        if not new:
+            return sitemaps
+        sitemaps.extend(new)
+        seen.update(s["sitemap_id"] for s in new)
+        if len(page) < limit:
+            return sitemaps
+        from_site_id = page[-1]["sitemap_id"]
+
+
+def get_sitemap_tree(
+    client, host_id: str, limit: int = 100, max_depth: Optional[int] = None
+) -> List[SitemapNode]:
+    """walk sitemap tree of host breadth first
+
+    Children of all nodes of one level are requested concurrently in client
+    thread pool. Api or connection error of expanding node is stored in
+    node.error, other nodes are still expanded.
+
+    Args:
+        client (YandexWebmaster): api client
+        host_id (str): id of host
+        limit (int, optional): page size of get_sitemaps. Defaults to 100.
+        max_depth (Optional[int], optional): max depth of sitemap indexes expansion. Defaults to None.
+
+    Returns:
+        List[SitemapNode]: root sitemaps
+    """
+    roots = [
+        SitemapNode.from_response(s)
+        for s in list_sitemaps(client, host_id, limit=limit)
+    ]
+
+    def expand(node: SitemapNode) -> List[SitemapNode]:
+        try:
+            children = list_sitemaps(
+                client, host_id, parent_id=node.sitemap_id, limit=limit
+            )
+        except (BaseYandexWebmasterError, RequestException) as e:
+            node.error = e
+            return []
+        return [SitemapNode.from_response(s) for s in children]
+
+    level = roots
+    depth = 0
+    while level and (max_depth is None or depth < max_depth):
+        parents = [node for node in level if node.children_count > 0]
+        level = []
+        for node, children in zip(parents, client._map(expand, parents)):
+            node.children = children
+            level.extend(children)
+        depth += 1
+    return roots
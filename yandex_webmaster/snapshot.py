@@ -0,0 +1,38 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+# snapshot field -> client method
+SNAPSHOT_METHODS = {
+    "host": "get_host",
+    "indexing_stats": "get_indexing_stats",
+    "diagnostics": "diagnostic_site",
+    "recrawl_quota": "get_recrawl_quota",
+    "sqi_history": "get_sqi_history",
+    "external_links_history": "get_external_links_history",
+}
+
+
+@dataclass
+class HostSnapshot(object):
+    """host health snapshot, field is None when its request failed,
+    error of failed request is stored in `errors` by field name"""
+
+    host_id: str
+    host: Optional[dict] = None
+    indexing_stats: Optional[dict] = None
+    diagnostics: Optional[dict] = None
+    recrawl_quota: Optional[dict] = None
+    sqi_history: Optional[dict] = None
+    external_links_history: Optional[dict] = None
+    errors: Dict[str, Exception] = field(default_factory=dict)
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.errors
+
+    def dict(self) -> dict:
+        data = {"host_id": self.host_id}
+        for name in SNAPSHOT_METHODS:
+            data[name] = getattr(self, name)
+        data["errors"] = {name: str(error) for name, error in self.errors.items()}
+        return data
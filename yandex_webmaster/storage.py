@@ -0,0 +1,306 @@
+import json
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .pagination import iter_pages
+
+INDEXING = "indexing"
+INSEARCH = "insearch"
+EXTERNAL_LINKS = "external_links"
+BROKEN_LINKS = "broken_links"
+
+KINDS = (INDEXING, INSEARCH, EXTERNAL_LINKS, BROKEN_LINKS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    host_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    path TEXT NOT NULL,
+    source_url TEXT,
+    source_domain TEXT,
+    status TEXT,
+    http_code INTEGER,
+    title TEXT,
+    date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_host ON samples (kind, host_id);
+CREATE INDEX IF NOT EXISTS samples_url ON samples (kind, url);
+CREATE INDEX IF NOT EXISTS samples_path ON samples (kind, path);
+CREATE INDEX IF NOT EXISTS samples_source_domain ON samples (kind, source_domain);
+CREATE INDEX IF NOT EXISTS samples_status ON samples (kind, status);
+CREATE INDEX IF NOT EXISTS samples_http_code ON samples (kind, http_code);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS samples_fts USING fts5 (
+    url, source_url, title, content='samples', content_rowid='id'
+);
+"""
+
+# upper bound for prefix range scan, sorts after any other character
+_PREFIX_END = "\U0010ffff"
+
+
+def _path(url: str) -> str:
+    parsed = urlparse(url)
+    path = parsed.path or "/"
+    if parsed.query:
+        path = f"{path}?{parsed.query}"
+    return path
+
+
+def _fts_query(text: str) -> str:
+    """every word of text as quoted fts5 term, so punctuation is not parsed
+    as query syntax"""
+    words = text.split()
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def _domain(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    return urlparse(url).hostname
+
+
+class SamplesIndex(object):
+    """local sqlite index over downloaded samples
+
+    Stores items of get_indexing_samples, get_insearch_url_samples,
+    get_external_links_samples and get_broken_internal_links_samples with
+    indexes by url, url path, source domain and status. Full text search uses
+    sqlite FTS5 when it is available.
+
+    Args:
+        path (str, optional): sqlite database path. Defaults to ":memory:".
+
+    Example:
+        index = SamplesIndex("samples.db")
+        index.load(client, host_id, BROKEN_LINKS, indicator="SITE_ERROR")
+        index.search(BROKEN_LINKS, url_prefix="/catalog/")
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def load(
+        self,
+        client,
+        host_id: str,
+        kind: str,
+        indicator: Optional[str] = None,
+        limit: int = 100,
+    ) -> int:
+        """download all samples of kind from api and replace stored samples of host,
+        stored samples are kept when download fails
+
+        Args:
+            client (YandexWebmaster): api client
+            host_id (str): id of host
+            kind (str): one of INDEXING, INSEARCH, EXTERNAL_LINKS, BROKEN_LINKS
+            indicator (Optional[str], optional): required for BROKEN_LINKS. Defaults to None.
+            limit (int, optional): page size. Defaults to 100.
+
+        Returns:
+            int: count of stored samples
+        """
+        if kind == INDEXING:
+            items = iter_pages(
+                client.get_indexing_samples, "samples", limit, host_id=host_id
+            )
+        elif kind == INSEARCH:
+            items = iter_pages(
+                client.get_insearch_url_samples, "samples", limit, host_id=host_id
+            )
+        elif kind == EXTERNAL_LINKS:
+            items = iter_pages(
+                client.get_external_links_samples, "links", limit, host_id=host_id
+            )
+        elif kind == BROKEN_LINKS:
+            if indicator is None:
+                raise ValueError("indicator is required for broken links")
+            items = iter_pages(
+                client.get_broken_internal_links_samples,
+                "links",
+                limit,
+                host_id=host_id,
+                indicator=indicator,
+            )
+        else:
+            raise ValueError(f"unknown kind: {kind}")
+        with self._conn:
+            self._delete(kind=kind, host_id=host_id, status=indicator)
+            return self._insert(kind, host_id, items, indicator)
+
+    def add(
+        self,
+        kind: str,
+        host_id: str,
+        items: Iterable[dict],
+        indicator: Optional[str] = None,
+    ) -> int:
+        """store samples
+
+        Args:
+            kind (str): one of INDEXING, INSEARCH, EXTERNAL_LINKS, BROKEN_LINKS
+            host_id (str): id of host
+            items (Iterable[dict]): samples or links from api response
+            indicator (Optional[str], optional): broken link indicator, stored as status. Defaults to None.
+
+        Returns:
+            int: count of stored samples
+        """
+        with self._conn:
+            return self._insert(kind, host_id, items, indicator)
+
+    def clear(
+        self,
+        kind: Optional[str] = None,
+        host_id: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> None:
+        with self._conn:
+            self._delete(kind=kind, host_id=host_id, status=status)
+
+    def _insert(
+        self,
+        kind: str,
+        host_id: str,
+        items: Iterable[dict],
+        indicator: Optional[str],
+    ) -> int:
+        if kind not in KINDS:
+            raise ValueError(f"unknown kind: {kind}")
+        count = 0
+        cursor = self._conn.cursor()
+        for item in items:
+            if kind in (EXTERNAL_LINKS, BROKEN_LINKS):
+                url = item["destination_url"]
+                source_url = item.get("source_url")
+                date = item.get("discovery_date")
+            else:
+                url = item["url"]
+                source_url = None
+                date = item.get("access_date") or item.get("last_access")
+            cursor.execute(
+                "INSERT INTO samples (kind, host_id, url, path, source_url,"
+                " source_domain, status, http_code, title, date, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    host_id,
+                    url,
+                    _path(url),
+                    source_url,
+                    _domain(source_url),
+                    indicator or item.get("status"),
+                    item.get("http_code"),
+                    item.get("title"),
+                    date,
+                    json.dumps(item, ensure_ascii=False),
+                ),
+            )
+            if self.fts_enabled:
+                cursor.execute(
+                    "INSERT INTO samples_fts (rowid, url, source_url, title)"
+                    " VALUES (?, ?, ?, ?)",
+                    (cursor.lastrowid, url, source_url, item.get("title")),
+                )
+            count += 1
+        return count
+
+    def _delete(self, **filters) -> None:
+        conditions, params = self._conditions(**filters)
+        where = self._where(conditions)
+        if self.fts_enabled:
+            self._conn.execute(
+                "INSERT INTO samples_fts (samples_fts, rowid, url, source_url, title)"
+                f" SELECT 'delete', id, url, source_url, title FROM samples{where}",
+                params,
+            )
+        self._conn.execute(f"DELETE FROM samples{where}", params)
+
+    def search(
+        self,
+        kind: Optional[str] = None,
+        host_id: Optional[str] = None,
+        url_prefix: Optional[str] = None,
+        source_domain: Optional[str] = None,
+        status: Optional[str] = None,
+        http_code: Optional[int] = None,
+        text: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """search stored samples
+
+        Args:
+            kind (Optional[str], optional): kind of samples. Defaults to None.
+            host_id (Optional[str], optional): id of host. Defaults to None.
+            url_prefix (Optional[str], optional): full url prefix or path prefix starting with "/". Defaults to None.
+            source_domain (Optional[str], optional): domain of link source. Defaults to None.
+            status (Optional[str], optional): sample status or broken link indicator. Defaults to None.
+            http_code (Optional[int], optional): http code. Defaults to None.
+            text (Optional[str], optional): words which url, source_url or title must contain, matched as plain terms. Defaults to None.
+            limit (Optional[int], optional): max rows. Defaults to None.
+
+        Returns:
+            List[dict]: samples as returned by api
+        """
+        conditions, params = self._conditions(
+            kind=kind,
+            host_id=host_id,
+            source_domain=source_domain,
+            status=status,
+            http_code=http_code,
+        )
+        if url_prefix:
+            column = "path" if url_prefix.startswith("/") else "url"
+            conditions.append(f"{column} >= ? AND {column} < ?")
+            params.extend([url_prefix, url_prefix + _PREFIX_END])
+        if text:
+            if self.fts_enabled:
+                conditions.append(
+                    "id IN (SELECT rowid FROM samples_fts WHERE samples_fts MATCH ?)"
+                )
+                params.append(_fts_query(text))
+            else:
+                conditions.append("(url LIKE ? OR source_url LIKE ? OR title LIKE ?)")
+                params.extend([f"%{text}%"] * 3)
+        query = f"SELECT data FROM samples{self._where(conditions)} ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(row[0]) for row in self._conn.execute(query, params)]
+
+    def count(self, **filters) -> int:
+        conditions, params = self._conditions(**filters)
+        query = f"SELECT COUNT(*) FROM samples{self._where(conditions)}"
+        return self._conn.execute(query, params).fetchone()[0]
+
+    @staticmethod
+    def _conditions(**filters) -> Tuple[List[str], list]:
+        conditions = []
+        params = []
+        for column, value in filters.items():
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        return conditions, params
+
+    @staticmethod
+    def _where(conditions: List[str]) -> str:
+        if not conditions:
+            return ""
+        return " WHERE " + " AND ".join(conditions)
@@ -0,0 +1,149 @@
+import json
+import codecs
+from typing import Any, Iterable, Iterator
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = ",]}" + _WHITESPACE
+# drop consumed part of buffer when it is larger than this
+_TRIM_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+
+
+class _Reader(object):
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        # start of string being read, kept in buffer on trim
+        self.mark = None
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        cut = self.pos if self.mark is None else self.mark
+        if cut > _TRIM_SIZE:
+            self.buffer = self.buffer[cut:]
+            self.pos -= cut
+            if self.mark is not None:
+                self.mark -= cut
+        for chunk in self._chunks:
+            if chunk:
+                self.buffer += self._decoder.decode(chunk)
+                return True
+        self.buffer += self._decoder.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def next_char(self) -> str:
+        while self.pos >= len(self.buffer):
+            if not self.fill():
+                raise ValueError("unexpected end of json")
+        char = self.buffer[self.pos]
+        self.pos += 1
+        return char
+
+    def next_token(self) -> str:
+        char = self.next_char()
+        while char in _WHITESPACE:
+            char = self.next_char()
+        return char
+
+    def read_string(self) -> str:
+        # opening quote is already read
+        self.mark = self.pos - 1
+        escaped = False
+        while True:
+            char = self.next_char()
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                value = json.loads(self.buffer[self.mark : self.pos])
+                self.mark = None
+                return value
+
+    def skip_value(self, first: str) -> None:
+        if first == '"':
+            self.read_string()
+            return
+        if first not in "[{":
+            # number, true, false, null
+            while True:
+                if self.pos >= len(self.buffer) and not self.fill():
+                    return
+                if self.buffer[self.pos] in _DELIMITERS:
+                    return
+                self.pos += 1
+        depth = 1
+        while depth:
+            char = self.next_char()
+            if char == '"':
+                self.read_string()
+            elif char in "[{":
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+
+    def decode_value(self) -> Any:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # number cut by end of chunk is decoded as its prefix ("1." -> 1),
+            # it is complete only if delimiter follows
+            if not self.eof and (
+                end == len(self.buffer) or self.buffer[end] not in _DELIMITERS
+            ):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array_items(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """incrementally parse items of top level array `key` of json object
+
+    Only one item is decoded at a time, other top level values are skipped.
+
+    Args:
+        chunks (Iterable[bytes]): body chunks, e.g. response.iter_content()
+        key (str): key of array in top level object, e.g. "links"
+
+    Example:
+        >>> list(iter_json_array_items([b'{"count": 2, "links": [{"a"', b': 1}, {"a": 2}]}'], "links"))
+        [{'a': 1}, {'a': 2}]
+    """
+    reader = _Reader(chunks)
+    if reader.next_token() != "{":
+        raise ValueError("json object expected")
+    token = reader.next_token()
+    while token != "}":
+        if token == ",":
+            token = reader.next_token()
+            continue
+        if token != '"':
+            raise ValueError(f"unexpected character {token!r}")
+        name = reader.read_string()
+        if reader.next_token() != ":":
+            raise ValueError("colon expected")
+        token = reader.next_token()
+        if name != key or token != "[":
+            reader.skip_value(token)
+            token = reader.next_token()
+            continue
+        token = reader.next_token()
+        while token != "]":
+            if token != ",":
+                reader.pos -= 1
+                yield reader.decode_value()
+            token = reader.next_token()
+        return